@@ -1,9 +1,34 @@
-from .calculate.res import *
 import argparse
+import json
 import os
+import sys
+
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+
+def __getattr__(name):
+    """
+    Имена calculate.res (ModelGrid, reading_results, ...) доступны
+    как light_curve.<имя>, модуль res импортируется при первом обращении
+    """
+    if name.startswith('__'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from .calculate import res
+    try:
+        return getattr(res, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
 
 
 def parsing():
+    from .calculate.cache import CACHE_MODES
+    from .calculate.bundle import BUNDLE_PATH
+    from .calculate.manifest import MANIFEST_PATH
+    from .calculate.memo import DISK_SIZE
+    from .calculate.prefetch import IO_THREADS
+    from .calculate.instrument import STATS, log, profile, setup_log
+
     parser = argparse.ArgumentParser(description='\
         program for determination characteristic times of SN\
         -----------------------------------------------------------------------------\
@@ -15,13 +40,158 @@ def parsing():
     parser.add_argument("--mag", action="store_true", help="reading .tt files")
     parser.add_argument("--lbol", action="store_true", help="reading .lbol files")
     parser.add_argument("--pf", action="store_true", help="plot pf relation")
+    parser.add_argument("--band", default=None, type=str,
+                        help="filter for --pf from synthetic photometry of .flx spectra: B, V or transmission file")
     parser.add_argument("--showL", default=0, type=int, help="plot light curve")
     parser.add_argument("--ta", action="store_true", help='plot data for ta ')
     parser.add_argument("--tb", action="store_true", help='plot data for tb ')
+    parser.add_argument("--cache", default="use", choices=CACHE_MODES,
+                        help="binary cache of parsed .tt/.lbol files: use, rebuild or off")
+    parser.add_argument("--jobs", default=1, type=int, help="number of processes for loading models, 0 - all cores")
+    parser.add_argument("--threads", default=IO_THREADS, type=int,
+                        help="number of threads reading model files when --jobs=1, 1 - sequential")
+    parser.add_argument("--memo", default="off", type=str,
+                        help="directory for memoized ta, tb, minB, dm15 between runs, off - memory only")
+    parser.add_argument("--memo-size", default=DISK_SIZE // 2 ** 20, type=int, help="size limit of --memo in MB")
+    parser.add_argument("--match", action="store_true", help="find grid models for every salt object (with --read)")
+    parser.add_argument("--tol", default=0.5, type=float, help="tolerance of standardization relation for --match")
+    parser.add_argument("--draws", default=0, type=int,
+                        help="Monte Carlo draws over salt errors for --stand and --match, 0 - no errors")
+    parser.add_argument("--bundle", default=None, type=str, help="read models from grid bundle made by 'light pack'")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, type=str,
+                        help="grid manifest for --mod=all, only new and changed models are recomputed; off - disable")
+
+    parser.add_argument("--server", default=None, type=str,
+                        help="take models, ta, tb, dm15 and minB from 'light serve' at this address, "
+                             "e.g. http://127.0.0.1:8765")
+    parser.add_argument("--log-level", default="INFO", choices=LOG_LEVELS,
+                        help="messages to show, DEBUG - also every read file")
+    parser.add_argument("--profile", default=None, type=str,
+                        help="write cProfile output PROFILE.prof and stage timers PROFILE.json")
 
+    commands = parser.add_subparsers(dest="command")
+    pack = commands.add_parser("pack", help="pack .tt and .lbol files of model directory into one bundle")
+    pack.add_argument("--data", default=os.path.join('data', 'raw_data'), type=str, help="model directory")
+    pack.add_argument("--out", default=BUNDLE_PATH, type=str, help="output bundle")
+    bench_cmd = commands.add_parser("bench", help="time readers and analysis, write JSON report")
+    bench_cmd.add_argument("--data", default=os.path.join('data', 'raw_data'), type=str, help="model directory")
+    bench_cmd.add_argument("--scale", default=[1, 10], type=int, nargs='+', help="sizes of synthetic grids")
+    bench_cmd.add_argument("--repeat", default=3, type=int, help="number of runs for every measurement")
+    bench_cmd.add_argument("--out", default=None, type=str, help="output JSON file, default - print")
+    bench_cmd.add_argument("--startup", action="store_true",
+                           help="only CLI startup: python -X importtime and light --help")
+    render = commands.add_parser("render", help="draw all figures without display (Agg) in worker processes")
+    render.add_argument("--data", default=os.path.join('data', 'raw_data'), type=str, help="model directory")
+    render.add_argument("--out", default="graphics", type=str, help="directory for figures")
+    render.add_argument("--dpi", default=300, type=int, help="resolution of figures")
+    render.add_argument("--num", default=10, type=int, help="number of light curves on lbol figure")
+    sweep = commands.add_parser("sweep", help="evaluate ta, tb and matches (with --read) over parameter grids")
+    sweep.add_argument("--data", default=os.path.join('data', 'raw_data'), type=str, help="model directory")
+    sweep.add_argument("--eps", default=['1e-5'], nargs='+', help="values of eps or start:stop:num")
+    sweep.add_argument("--MB", default=None, nargs='+', help="values of MB, default from salt data")
+    sweep.add_argument("--alpha", default=None, nargs='+', help="values of alpha, default from salt data")
+    sweep.add_argument("--beta", default=None, nargs='+', help="values of beta, default from salt data")
+    sweep.add_argument("--tol", default=['0.5'], nargs='+', help="tolerances of standardization relation")
+    sweep.add_argument("--out", default="sweep.npz", type=str, help="output .npz file")
+    serve_cmd = commands.add_parser("serve", help="keep the grid in memory and answer queries over localhost HTTP")
+    serve_cmd.add_argument("--data", default=os.path.join('data', 'raw_data'), type=str, help="model directory")
+    serve_cmd.add_argument("--host", default="127.0.0.1", type=str, help="address to listen on")
+    serve_cmd.add_argument("--port", default=8765, type=int, help="port to listen on")
+    serve_cmd.add_argument("--interval", default=1., type=float,
+                           help="seconds between checks of model files for changes")
 
     args = parser.parse_args()
+    setup_log(args.log_level)
+    with profile(args.profile):
+        try:
+            run(args)
+        except OSError as e:
+            log.error(f'light: error: {e}')
+            sys.exit(1)
+    log.debug(json.dumps(STATS.summary()))
+
+
+def run(args):
+    """
+    Запуск подкоманды. Модули рисования и подкоманд
+    импортируются только там, где они нужны
+    """
+    from .calculate import prefetch
+    from .calculate.memo import MEMO
+    prefetch.IO_THREADS = args.threads
+    if args.memo != 'off':
+        MEMO.disk(args.memo, args.memo_size * 2 ** 20)
+    COMMANDS.get(args.command, run_models)(args)
+
+
+def run_pack(args):
+    from .calculate.bundle import pack_grid
+    pack_grid(args.data, args.out, args.cache)
+
+
+def run_bench(args):
+    from .calculate.bench import bench
+    bench(args.out, args.data, args.scale, args.repeat, args.jobs, args.startup)
+
+
+def run_render(args):
+    from .calculate.render import grid_figures, correlation_figure, render_all
+    from .calculate.bundle import GridBundle, grid_models
+    from .calculate.grid import ModelGrid
+    from .calculate.res import reading_results
+    bundle = GridBundle(args.bundle) if args.bundle else None
+    models = bundle.models() if bundle is not None else grid_models(args.data)
+    grid = ModelGrid.load(models, args.cache, bundle=bundle, data_dir=os.path.abspath(args.data))
+    specs = grid_figures(grid, args.out, args.num, args.dpi)
+    if args.read:
+        dirname, filename = os.path.split(args.read)
+        read = reading_results(dirname, filename)
+        salt = ModelGrid.load(read.mname, args.cache, bundle=bundle, data_dir=os.path.abspath(args.data))
+        specs.append(correlation_figure(read, salt.minB(), args.out, args.dpi))
+    for path in render_all(specs, args.jobs):
+        print(f'{path} saved')
+
+
+def run_sweep_command(args):
+    from .calculate.sweep import run_sweep, parse_values
+    from .calculate.bundle import GridBundle, grid_models
+    from .calculate.grid import ModelGrid
+    from .calculate.res import reading_results
+    bundle = GridBundle(args.bundle) if args.bundle else None
+    models = bundle.models() if bundle is not None else grid_models(args.data)
+    grid = ModelGrid.load(models, args.cache, args.jobs, bundle, data_dir=os.path.abspath(args.data))
+    read = None
+    if args.read:
+        dirname, filename = os.path.split(args.read)
+        read = reading_results(dirname, filename)
+    values = [None if v is None else parse_values(v) for v in (args.MB, args.alpha, args.beta)]
+    run_sweep(grid, read, parse_values(args.eps), *values, parse_values(args.tol), args.out)
+
+
+def run_serve(args):
+    from .calculate.server import serve
+    serve(args.data, args.read, args.cache, args.host, args.port, args.interval)
+
+
+def run_models(args):
+    """
+    Расчеты и графики для моделей сетки (без подкоманды)
+    """
+    import numpy as np
+    from .calculate.grid import ModelGrid, model_times, model_pf_relation, model_minB
+    from .calculate.res import (reading_results, plot_correlation, synthetic_pf_relation, show_pf_relation,
+                                show_lbol, plot_ta, plot_tb, pyplot)
+    from .calculate.bundle import GridBundle, grid_models
+    from .calculate.manifest import GridManifest
     reading = False
+    bundle = GridBundle(args.bundle) if args.bundle else None
+    manifest = None
+    client = None
+    times_of, pf_of, minB_of = model_times, model_pf_relation, model_minB
+    if args.server:
+        from .calculate.server import GridClient
+        client = GridClient(args.server)
+        times_of, pf_of, minB_of = client.model_times, client.model_pf_relation, client.model_minB
 
     if args.read:
         dirname, filename = os.path.split(args.read)
@@ -29,13 +199,16 @@ def parsing():
         reading = True
 
     if args.mod == 'all':
-        models = {}
-        path = os.path.join('data', 'raw_data')
-        files = os.listdir(path)
-        for i in range(len(files)):
-            mod = files[i]
-            if mod[-2:] == 'tt':
-                models[mod[:-3]] = i
+        if client is not None:
+            models = client.models()
+        elif bundle is not None:
+            models = bundle.models()
+        elif args.manifest != 'off':
+            manifest = GridManifest(args.manifest)
+            manifest.update(args.cache, args.jobs)
+            models = manifest.models()
+        else:
+            models = grid_models(os.path.join('data', 'raw_data'))
         reading = False
         print(models.keys())
 
@@ -45,44 +218,81 @@ def parsing():
 
     if args.stand=='Plot':
         if args.mod == 'salt' and reading:
-            plot_correlation(read, models)
-            models = find_appropriate_models(read, models)
+            minMB = minB_of(models, cache=args.cache, jobs=args.jobs, bundle=bundle)
+            plot_correlation(read, models, minMB=minMB)
+            if args.draws:
+                print(read.stand_probability(minMB, args.draws))
+            models = read.find_stand_data(minMB)
             print(models)
         else:
             print('plot only for salt data')
     elif args.stand=='NoPlot':
         if reading:
-            models = find_appropriate_models(read, models)
+            minMB = minB_of(models, cache=args.cache, jobs=args.jobs, bundle=bundle)
+            if args.draws:
+                print(read.stand_probability(minMB, args.draws))
+            models = read.find_stand_data(minMB)
             print(models)
         else:
             print('you have no appropriate models')
 
-    if args.mag:
-        mag_read = read_mag_reader(models)
+    if args.match:
+        if args.read:
+            if manifest is not None:
+                minMB = manifest.scalars(models, 'minB')
+            else:
+                minMB = minB_of(models, cache=args.cache, jobs=args.jobs, bundle=bundle)
+            names = list(models.keys())
+            if args.draws:
+                p = read.match_probability(minMB, args.tol, args.draws)
+                for i, sn in enumerate(read.names):
+                    print(sn, {names[k]: round(float(p[i, k]), 4) for k in np.argsort(-p[i]) if p[i, k] > 0})
+            else:
+                offsets, matched = read.match_grid(minMB, args.tol)
+                for i, sn in enumerate(read.names):
+                    print(sn, [names[k] for k in matched[offsets[i]:offsets[i + 1]]])
+        else:
+            print('use --read to match salt data')
 
-    if args.lbol:
-        lbol_read = read_lbol_reader(models)
+    if args.mag or args.lbol:
+        ModelGrid.load(models, args.cache, args.jobs, bundle)
 
     if args.pf:
-        mag_read = read_mag_reader(models)
-        show_pf_relation(mag_read)
-        plt.show()
+        if args.band:
+            if bundle is not None:
+                bundle.require('.flx')
+            relation = synthetic_pf_relation(models, args.band, cache=args.cache)
+            show_pf_relation(None, relation=relation, band=args.band)
+        else:
+            show_pf_relation(None, relation=pf_of(models, cache=args.cache, jobs=args.jobs, bundle=bundle))
+        pyplot().show()
 
     if args.showL:
-        lbol_read = read_lbol_reader(models)
-        show_lbol(lbol_read, args.showL)
+        show_lbol(ModelGrid.load(models, args.cache, args.jobs, bundle), args.showL)
+
+    if args.ta or args.tb:
+        lbol_read = None
+        if manifest is not None:
+            times = manifest.times(models)
+        else:
+            times = times_of(models, cache=args.cache, jobs=args.jobs, bundle=bundle)
 
     if args.ta:
-        lbol_read = read_lbol_reader(models)
-        plot_ta(lbol_read)
-        plt.show()
+        plot_ta(lbol_read, times=times)
+        pyplot().show()
 
     if args.tb:
-        lbol_read = read_lbol_reader(models)
-        plot_tb(lbol_read)
-        plt.show()
+        plot_tb(lbol_read, times=times)
+        pyplot().show()
 
 
+COMMANDS = {
+    'pack': run_pack,
+    'bench': run_bench,
+    'render': run_render,
+    'sweep': run_sweep_command,
+    'serve': run_serve,
+}
 
 
 if __name__ == "__main__":
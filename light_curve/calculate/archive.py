@@ -0,0 +1,229 @@
+import io
+import os
+import threading
+
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+def is_archive(path):
+    """
+    Архив с файлами моделей (zip или tar), а не обычная директория
+    """
+    return path.lower().endswith(ARCHIVE_SUFFIXES) and os.path.isfile(path)
+
+
+CHUNK_SIZE = 2 ** 16
+
+
+class TarMember(io.RawIOBase):
+    """
+    Файл несжатого tar как поток байт: каждый кусок читается
+    по смещению в архиве из общего дескриптора под блокировкой
+    """
+    def __init__(self, fileobj, lock, offset, size):
+        self.fileobj = fileobj
+        self.lock = lock
+        self.offset = offset
+        self.size = size
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self.size - self.pos)
+        if n <= 0:
+            return 0
+        with self.lock:
+            self.fileobj.seek(self.offset + self.pos)
+            n = self.fileobj.readinto(memoryview(b)[:n])
+        self.pos += n
+        return n
+
+
+class Archive(object):
+    """
+    Чтение файлов из zip или tar архива без распаковки. Оглавление
+    (центральный каталог zip, заголовки tar) читается один раз, файл
+    ищется по имени в словаре, в том числе без директории внутри
+    архива: all_models_lbol.zip/m010005mh.lbol. Файлы zip и несжатого
+    tar читаются потоком при разборе. Файл сжатого tar читается в память
+    целиком под блокировкой: доступ к нему только последовательный,
+    поэтому для больших сеток лучше zip или несжатый tar
+    """
+    def __init__(self, path):
+        import tarfile
+        import zipfile
+        self.path = path
+        self.lock = threading.Lock()
+        if zipfile.is_zipfile(path):
+            self.handle = zipfile.ZipFile(path)
+            infos = [info for info in self.handle.infolist() if not info.is_dir()]
+            self.is_zip = True
+        else:
+            try:
+                self.handle = tarfile.open(path)
+            except tarfile.TarError as e:
+                raise OSError(f'cannot read archive {path}: {e}')
+            infos = [info for info in self.handle.getmembers() if info.isfile()]
+            self.is_zip = False
+            self.compressed = not isinstance(self.handle.fileobj, io.BufferedReader)
+        self.index = {}
+        for info in infos:
+            name = info.filename if self.is_zip else info.name
+            self.index.setdefault(os.path.basename(name), info)
+            self.index[name] = info
+        self.extensions = {os.path.splitext(name)[1] for name in self.index}
+
+    def names(self):
+        """
+        Имена файлов архива без директорий
+        """
+        return sorted({os.path.basename(name) for name in self.index})
+
+    def info(self, name):
+        try:
+            return self.index[name]
+        except KeyError:
+            raise FileNotFoundError(f'{name} not in {self.path}')
+
+    def size(self, name):
+        info = self.info(name)
+        return info.file_size if self.is_zip else info.size
+
+    def stamp(self, name):
+        """
+        Отпечаток файла архива: контрольная сумма (время для tar)
+        и размер, не зависит от изменений других файлов архива
+        """
+        info = self.info(name)
+        if self.is_zip:
+            return info.CRC, info.file_size
+        return int(info.mtime), info.size
+
+    def open(self, name):
+        """
+        Файл архива в текстовом режиме. zip распаковывается при чтении,
+        потоки читают параллельно. Файл несжатого tar читается кусками
+        по смещению (TarMember), блокировка общего дескриптора только
+        на время чтения куска. Сжатый tar читается целиком под блокировкой
+        """
+        info = self.info(name)
+        if self.is_zip:
+            return io.TextIOWrapper(self.handle.open(info), encoding='latin1')
+        if not self.compressed and not info.issparse():
+            member = TarMember(self.handle.fileobj, self.lock, info.offset_data, info.size)
+            return io.TextIOWrapper(io.BufferedReader(member, CHUNK_SIZE), encoding='latin1')
+        with self.lock:
+            data = self.handle.extractfile(info).read()
+        return io.TextIOWrapper(io.BytesIO(data), encoding='latin1')
+
+    def close(self):
+        with self.lock:
+            self.handle.close()
+
+
+ARCHIVES = {}
+_archives_lock = threading.Lock()
+
+
+def open_archive(path):
+    """
+    Открытый архив path: оглавление читается один раз на процесс
+    и перечитывается, если архив изменился (прежний архив закрывается)
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _archives_lock:
+        entry = ARCHIVES.get(path)
+        if entry is None or entry[0] != stamp:
+            if entry is not None:
+                entry[1].close()
+            entry = ARCHIVES[path] = (stamp, Archive(path))
+        return entry[1]
+
+
+def split_member(fname):
+    """
+    Путь вида archive.zip/name делим на архив и имя файла в нем
+    :return: archive, name или None, fname для обычных файлов
+    """
+    path, name = os.path.split(fname)
+    if path and is_archive(path):
+        return path, name
+    return None, fname
+
+
+def isdir(path):
+    """
+    Директория или архив с файлами моделей
+    """
+    return os.path.isdir(path) or is_archive(path)
+
+
+def listdir(path):
+    """
+    Имена файлов директории или архива
+    """
+    if is_archive(path):
+        return open_archive(path).names()
+    return os.listdir(path)
+
+
+EXTENSIONS = {}
+
+
+def extensions(path):
+    """
+    Расширения файлов директории или архива ('.tt', '.lbol', ...).
+    Для директории запоминаются до ее изменения
+    """
+    if is_archive(path):
+        return open_archive(path).extensions
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    with _archives_lock:
+        entry = EXTENSIONS.get(path)
+    if entry is None or entry[0] != mtime:
+        entry = mtime, {os.path.splitext(name)[1] for name in os.listdir(path)}
+        with _archives_lock:
+            EXTENSIONS[path] = entry
+    return entry[1]
+
+
+def isfile(fname):
+    archive, name = split_member(fname)
+    if archive is None:
+        return os.path.isfile(fname)
+    return name in open_archive(archive).index
+
+
+def open_text(fname):
+    """
+    Текстовый файл на диске или в архиве
+    """
+    archive, name = split_member(fname)
+    if archive is None:
+        return open(fname)
+    return open_archive(archive).open(name)
+
+
+def stamp(fname):
+    """
+    Время изменения и размер файла или отпечаток файла архива
+    :raise OSError: файла нет
+    """
+    archive, name = split_member(fname)
+    if archive is None:
+        st = os.stat(fname)
+        return st.st_mtime_ns, st.st_size
+    return open_archive(archive).stamp(name)
+
+
+def file_size(fname):
+    archive, name = split_member(fname)
+    if archive is None:
+        return os.path.getsize(fname)
+    return open_archive(archive).size(name)
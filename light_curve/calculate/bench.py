@@ -0,0 +1,199 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from .res import (ResReader, read_mag_reader, read_lbol_reader, find_times, pf_relation)
+from .bundle import grid_models
+from .memo import MEMO
+
+
+def timeit(fn, repeat=3):
+    """
+    Время выполнения fn в секундах для repeat запусков.
+    Вывод функций на экран подавляется. Перед каждым запуском память
+    MEMO очищается, иначе повторы измеряют обращение к памяти, а не разбор
+    """
+    times = []
+    for _ in range(repeat):
+        MEMO.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def scaled_grid(path, models, scale, tmp):
+    """
+    Синтетическая сетка в scale раз больше исходной: ссылки на
+    файлы моделей под новыми именами в директории tmp
+    :return: {model: index}
+    """
+    if scale == 1:
+        return dict(models)
+    scaled = {}
+    for k in range(scale):
+        for name in models:
+            copy = f'{name}_{k:03d}'
+            for ext in ('.tt', '.lbol'):
+                src = os.path.abspath(os.path.join(path, name + ext))
+                if os.path.isfile(src):
+                    os.symlink(src, os.path.join(tmp, copy + ext))
+            scaled[copy] = len(scaled)
+    return scaled
+
+
+def salt_catalogue(fname, n, seed=0):
+    """
+    Синтетический файл результатов SALT из n объектов
+    """
+    rng = np.random.default_rng(seed)
+    with open(fname, 'w') as f:
+        f.write('0,name,Qfit,t0,err_t0,x0,err_x0,x1,err_x1,c,err_c,Mmax\n')
+        for i in range(n):
+            x1, c = rng.normal(0, 1), rng.normal(0.1, 0.1)
+            f.write(f'0,m{i:08d}mh,True,20.0,1e-06,6.7,0.0005,{x1},5e-05,{c},6e-05,-19.0\n')
+
+
+def run_benchmarks(path=os.path.join('data', 'raw_data'), scales=(1, 10), repeat=3, jobs=1):
+    """
+    Замеры чтения файлов, поиска ta/tb и стандартизации, а также
+    полных сценариев --pf и --ta на сетке path и на синтетических
+    сетках, увеличенных в scales раз
+    :return: список результатов
+    """
+    base = grid_models(path)
+    results = []
+    # уровень мемоизации на диске (--memo) на время замеров отключен
+    memo_path, memo_bytes = MEMO.path, MEMO.max_bytes
+    MEMO.disk(None)
+
+    def record(name, scale, n, times):
+        results.append({'name': name, 'scale': scale, 'models': n, 'repeat': len(times),
+                        'best': min(times), 'mean': float(np.mean(times))})
+
+    try:
+        for scale in scales:
+            tmp = tempfile.mkdtemp()
+            try:
+                models = scaled_grid(path, base, scale, tmp)
+                data_dir = os.path.abspath(path) if scale == 1 else tmp
+                # кэш замеров во временной директории, не в data/cache
+                cache_dir = os.path.join(tmp, 'cache')
+                n = len(models)
+
+                def read_mag(cache):
+                    return read_mag_reader(models, cache, jobs, data_dir=data_dir, cache_dir=cache_dir)
+
+                def read_lbol(cache):
+                    return read_lbol_reader(models, cache, jobs, data_dir=data_dir, cache_dir=cache_dir)
+
+                record('MagReader parse', scale, n, timeit(lambda: read_mag('off'), repeat))
+                record('LbolReader parse', scale, n, timeit(lambda: read_lbol('off'), repeat))
+                with contextlib.redirect_stdout(io.StringIO()):
+                    read_mag('use')
+                    read_lbol('use')
+                record('MagReader cached', scale, n, timeit(lambda: read_mag('use'), repeat))
+                record('LbolReader cached', scale, n, timeit(lambda: read_lbol('use'), repeat))
+
+                with contextlib.redirect_stdout(io.StringIO()):
+                    mag_read = read_mag('use')
+                    lbol_read = read_lbol('use')
+                record('find_ta_tb per model', scale, n,
+                       timeit(lambda: [lbol_read[name][0].find_ta_tb() for name in lbol_read], repeat))
+                record('find_times batch', scale, n, timeit(lambda: find_times(lbol_read), repeat))
+                record('pf_relation batch', scale, n, timeit(lambda: pf_relation(mag_read), repeat))
+
+                salt = os.path.join(tmp, 'results_SALT.txt')
+                salt_catalogue(salt, n)
+                record('ResReader parse', scale, n, timeit(lambda: ResReader(salt), repeat))
+                with contextlib.redirect_stdout(io.StringIO()):
+                    read = ResReader(salt)
+                minMB = np.array([mag_read[name][0].minB for name in mag_read])
+                record('find_stand_data', scale, n, timeit(lambda: read.find_stand_data(minMB), repeat))
+                record('match_grid', scale, n, timeit(lambda: read.match_grid(minMB), repeat))
+
+                record('pipeline --pf', scale, n, timeit(lambda: pf_relation(read_mag('use')), repeat))
+                record('pipeline --ta', scale, n, timeit(lambda: find_times(read_lbol('use')), repeat))
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+    finally:
+        MEMO.disk(memo_path, memo_bytes)
+        MEMO.clear()
+    return results
+
+
+def parse_importtime(text):
+    """
+    Разбор вывода python -X importtime
+    :return: {модуль: (собственное время, суммарное время)} в секундах
+    """
+    result = {}
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        result[name.strip()] = (int(own) * 1e-6, int(cumulative) * 1e-6)
+    return result
+
+
+def startup_benchmarks(repeat=3, top=10):
+    """
+    Запуск CLI в новом интерпретаторе: время импорта пакета по
+    python -X importtime, самые долгие модули, и полное время light --help
+    :return: словарь результатов
+    """
+    package = __package__.split('.')[0]
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {package}'],
+                              capture_output=True, text=True, env=env, check=True)
+        runs.append(parse_importtime(proc.stderr))
+    imports = [run[package][1] for run in runs]
+    best = runs[int(np.argmin(imports))]
+    slowest = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:top]
+
+    def cli_help():
+        subprocess.run([sys.executable, '-c', f'from {package} import parsing; parsing()', '--help'],
+                       stdout=subprocess.DEVNULL, env=env, check=True)
+
+    help_times = timeit(cli_help, repeat)
+    return {
+        'import': {'repeat': repeat, 'best': min(imports), 'mean': float(np.mean(imports))},
+        'help': {'repeat': repeat, 'best': min(help_times), 'mean': float(np.mean(help_times))},
+        'matplotlib': 'matplotlib' in best,
+        'slowest': [{'module': name, 'self': own, 'cumulative': cumulative}
+                    for name, (own, cumulative) in slowest],
+    }
+
+
+def bench(out=None, path=os.path.join('data', 'raw_data'), scales=(1, 10), repeat=3, jobs=1, startup_only=False):
+    """
+    Запуск замеров и вывод результатов в JSON (в файл out или на экран)
+    :param startup_only: только время запуска CLI
+    """
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'jobs': jobs,
+        'startup': startup_benchmarks(repeat),
+        'results': [] if startup_only else run_benchmarks(path, scales, repeat, jobs),
+    }
+    text = json.dumps(report, indent=1)
+    if out:
+        with open(out, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    return report
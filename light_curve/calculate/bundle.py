@@ -0,0 +1,207 @@
+import mmap
+import os
+import re
+import zipfile
+import numpy as np
+from .cache import cached_loadtxt
+from .tt_read import MagReader, find_header
+from .lbol_read import LbolReader
+from .times import model_mni
+from .instrument import log
+from . import archive
+
+
+BUNDLE_PATH = os.path.join('data', 'grid.npz')
+# продукты STELLA в пакете, остальные (.res, .flx, .swd, .tau) читаются из директории моделей
+BUNDLE_PRODUCTS = ('.tt', '.lbol')
+MODEL_NAME = re.compile(r'^m(\d{2})(\d{2})(\d{2})mh$')
+
+
+def grid_models(path=os.path.join('data', 'raw_data')):
+    """
+    Модели из директории или архива с результатами STELLA (по .tt
+    файлам, если их нет - по .lbol файлам)
+    :return: {model: index}
+    """
+    files = archive.listdir(path)
+    models = [mod[:-3] for mod in files if mod[-3:] == '.tt']
+    if not models:
+        models = [mod[:-5] for mod in files if mod[-5:] == '.lbol']
+    return {mod: i for i, mod in enumerate(models)}
+
+
+def model_params(mname):
+    """
+    Параметры модели, закодированные в имени: m020209mh -> (2, 2, 9).
+    Для имен другого вида возвращаем (-1, -1, -1)
+    """
+    match = MODEL_NAME.match(mname)
+    if match is None:
+        return -1, -1, -1
+    return tuple(int(group) for group in match.groups())
+
+
+def concat_tables(tables):
+    """
+    Склеиваем таблицы разной длины
+    :return: data, offsets
+    """
+    offsets = np.zeros(len(tables) + 1, dtype=np.int64)
+    np.cumsum([len(table) for table in tables], out=offsets[1:])
+    return np.concatenate(tables), offsets
+
+
+def pack_grid(path=os.path.join('data', 'raw_data'), out=BUNDLE_PATH, cache='use'):
+    """
+    Собираем .tt и .lbol таблицы всех моделей директории в один
+    несжатый .npz файл со смещениями по моделям и таблицей параметров.
+    Другие продукты (BUNDLE_PRODUCTS) в пакет не входят
+    :return: имена упакованных моделей
+    """
+    names, tt, lbol = [], [], []
+    tt_columns = None
+    for mname in grid_models(path):
+        tt_file = os.path.join(path, mname + '.tt')
+        lbol_file = os.path.join(path, mname + '.lbol')
+        if not archive.isfile(lbol_file):
+            log.warning(f'There is no data for {mname}.lbol')
+            continue
+        try:
+            header, columns = find_header(tt_file)
+        except OSError as e:
+            log.warning(f'There is no table in {mname}.tt ({e}), skipped')
+            continue
+        log.debug(f"Packing run {mname}")
+        if tt_columns is None:
+            tt_columns = columns
+        elif columns != tt_columns:
+            log.warning(f'{mname}.tt has other columns, skipped')
+            continue
+        tt.append(np.asarray(cached_loadtxt(tt_file, cache, skiprows=header + 1, dtype=float)))
+        lbol.append(np.asarray(cached_loadtxt(lbol_file, cache, skiprows=1, dtype=float)))
+        names.append(mname)
+
+    if not names:
+        raise OSError(f'no models in {path}')
+
+    tt_data, tt_offsets = concat_tables(tt)
+    lbol_data, lbol_offsets = concat_tables(lbol)
+    out_dir = os.path.dirname(out)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    np.savez(out,
+             names=np.array(names),
+             mni=np.array([model_mni(name) for name in names]),
+             params=np.array([model_params(name) for name in names], dtype=np.int64),
+             tt_columns=np.array(tt_columns),
+             tt_data=tt_data, tt_offsets=tt_offsets,
+             lbol_data=lbol_data, lbol_offsets=lbol_offsets)
+    log.info(f'{len(names)} models packed into {out}')
+    return names
+
+
+class GridBundle(object):
+    """
+    Пакет сетки моделей, созданный pack_grid. Файл открывается один
+    раз и отображается в память, массивы - представления без копирования
+    """
+    def __init__(self, fname=BUNDLE_PATH):
+        self.fname = fname
+        with open(fname, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.arrays = self.map_arrays()
+
+        self.names = self.arrays['names']
+        self.mni = self.arrays['mni']
+        self.params = self.arrays['params']
+        self.tt_columns = [str(name) for name in self.arrays['tt_columns']]
+        self.index = {str(name): i for i, name in enumerate(self.names)}
+
+    def map_arrays(self):
+        """
+        Находим смещения .npy массивов внутри несжатого .npz
+        """
+        arrays = {}
+        with zipfile.ZipFile(self._mm) as zf:
+            infos = zf.infolist()
+        for info in infos:
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise OSError(f'{self.fname} is compressed, repack it with pack_grid')
+            # локальный заголовок: 30 байт + имя файла + дополнительное поле
+            start = info.header_offset
+            name_len = int.from_bytes(self._mm[start + 26:start + 28], 'little')
+            extra_len = int.from_bytes(self._mm[start + 28:start + 30], 'little')
+            self._mm.seek(start + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(self._mm)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(self._mm)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(self._mm)
+            count = int(np.prod(shape))
+            array = np.frombuffer(self._mm, dtype=dtype, count=count, offset=self._mm.tell())
+            arrays[info.filename[:-4]] = array.reshape(shape, order='F' if fortran else 'C')
+        return arrays
+
+    def close(self):
+        """
+        Закрываем файл, если на массивы пакета больше нет ссылок
+        """
+        self.arrays = {}
+        self.names = self.mni = self.params = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+
+    def models(self):
+        """
+        :return: {model: index}
+        """
+        return dict(self.index)
+
+    def require(self, ext):
+        """
+        Проверяем, что продукт ext есть в пакете
+        :raise OSError: продукт читается только из директории моделей
+        """
+        if ext not in BUNDLE_PRODUCTS:
+            raise OSError(f'{ext} files are not packed into {self.fname} (only {", ".join(BUNDLE_PRODUCTS)}), '
+                          f'read them from the model directory without --bundle')
+
+    def row(self, mname):
+        """
+        Номер модели в пакете
+        :raise KeyError: модели нет в пакете
+        """
+        try:
+            return self.index[mname]
+        except KeyError:
+            raise KeyError(f'model {mname} is not in bundle {self.fname}, repack it with pack_grid') from None
+
+    def tt_table(self, mname):
+        """
+        Таблица .tt модели без копирования
+        """
+        i = self.row(mname)
+        offsets = self.arrays['tt_offsets']
+        return self.arrays['tt_data'][offsets[i]:offsets[i + 1]]
+
+    def lbol_table(self, mname):
+        """
+        Таблица .lbol модели без копирования
+        """
+        i = self.row(mname)
+        offsets = self.arrays['lbol_offsets']
+        return self.arrays['lbol_data'][offsets[i]:offsets[i + 1]]
+
+    def mag_reader(self, mname):
+        """
+        MagReader для модели из пакета
+        """
+        return MagReader.from_table(mname, self.tt_columns, self.tt_table(mname))
+
+    def lbol_reader(self, mname):
+        """
+        LbolReader для модели из пакета
+        """
+        return LbolReader.from_table(mname, self.lbol_table(mname))
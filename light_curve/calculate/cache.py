@@ -0,0 +1,113 @@
+import hashlib
+import glob
+import os
+import threading
+import numpy as np
+from .instrument import log, count, timer
+from . import archive
+
+
+CACHE_DIR = os.path.join('data', 'cache')
+CACHE_MODES = ('use', 'rebuild', 'off')
+
+
+def source_key(fname, **kwargs):
+    """
+    Ключ кэша для исходного файла: полный путь и параметры чтения,
+    время изменения и размер. Параметры входят в path_key, поэтому
+    полная таблица и подмножество столбцов одного файла - разные
+    записи, и drop_stale не удаляет одну при записи другой
+    :return: path_key, stat_key
+    """
+    mtime, size = archive.stamp(fname)
+    path = f'{os.path.abspath(fname)}|{sorted(kwargs.items())}'
+    path_key = hashlib.sha1(path.encode()).hexdigest()[:8]
+    stat_key = hashlib.sha1(f'{mtime}|{size}'.encode()).hexdigest()[:16]
+    return path_key, stat_key
+
+
+def cache_path(fname, cache_dir=None, **kwargs):
+    """
+    Путь к .npy файлу кэша для fname
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    path_key, stat_key = source_key(fname, **kwargs)
+    base = os.path.basename(fname)
+    return os.path.join(cache_dir, f'{base}.{path_key}.{stat_key}.npy')
+
+
+def drop_stale(fname, current, cache_dir=None, **kwargs):
+    """
+    Удаляем устаревшие записи кэша для fname, прочитанного
+    с теми же параметрами (файл изменился)
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    path_key, _ = source_key(fname, **kwargs)
+    base = os.path.basename(fname)
+    for old in glob.glob(os.path.join(cache_dir, f'{glob.escape(base)}.{path_key}.*.npy')):
+        if old != current:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def store(path, data):
+    """
+    Атомарная запись массива в кэш
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.save(f, np.ascontiguousarray(data))
+    os.replace(tmp, path)
+
+
+def parse_text(fname, **kwargs):
+    """
+    np.loadtxt с учетом времени разбора и прочитанных байт.
+    Файл архива (archive.zip/name) разбирается потоком без распаковки на диск
+    """
+    with timer('parse'):
+        if archive.split_member(fname)[0] is None:
+            data = np.loadtxt(fname, **kwargs)
+        else:
+            with archive.open_text(fname) as f:
+                data = np.loadtxt(f, **kwargs)
+    count('files_parsed')
+    count('bytes_read', archive.file_size(fname))
+    return data
+
+
+def cached_loadtxt(fname, cache='use', cache_dir=None, **kwargs):
+    """
+    np.loadtxt с бинарным кэшем разобранных таблиц. Кэш хранится
+    в .npy файлах и открывается через np.load(mmap_mode='r'),
+    запись становится недействительной при изменении исходного файла
+    :param cache: 'use' - брать из кэша, 'rebuild' - перечитать текст
+                  и перезаписать кэш, 'off' - читать текст без кэша
+    :param cache_dir: директория кэша, по умолчанию CACHE_DIR
+    :return: data
+    """
+    if cache not in CACHE_MODES:
+        raise ValueError(f'unknown cache mode {cache}, use one of {CACHE_MODES}')
+    if cache == 'off':
+        return parse_text(fname, **kwargs)
+
+    path = cache_path(fname, cache_dir, **kwargs)
+    if cache == 'use' and os.path.isfile(path):
+        try:
+            data = np.load(path, mmap_mode='r')
+            count('cache_hits')
+            return data
+        except (OSError, ValueError):
+            pass
+
+    count('cache_misses')
+    data = parse_text(fname, **kwargs)
+    try:
+        store(path, data)
+        drop_stale(fname, path, cache_dir, **kwargs)
+    except OSError as e:
+        log.warning(f'cannot write cache for {fname} with error {e}')
+    return data
@@ -0,0 +1,131 @@
+import numpy as np
+from .bundle import model_params
+
+
+# общая сетка времени таблиц эмулятора, дни
+TIME_GRID = np.arange(0., 365.5, 0.5)
+QUANTITIES = ('lbol', 'MB', 'MV')
+
+
+def resample(t, values, offsets, tgrid=TIME_GRID):
+    """
+    Склеенные кривые моделей на общей сетке времени,
+    nan вне интервала каждой кривой
+    :return: таблица (модели x tgrid)
+    """
+    offsets = np.asarray(offsets)
+    table = np.full((len(offsets) - 1, len(tgrid)), np.nan)
+    for i in np.flatnonzero(np.diff(offsets) > 0):
+        part = slice(offsets[i], offsets[i + 1])
+        table[i] = np.interp(tgrid, t[part], values[part], left=np.nan, right=np.nan)
+    return table
+
+
+class Emulator(object):
+    """
+    Интерполяция кривых блеска по параметрам сетки моделей
+    (model_params: m020209mh -> (2, 2, 9)). Кривые всех моделей заранее
+    пересчитаны на общую сетку времени, кривая в произвольной точке
+    параметров - среднее k ближайших моделей с весами 1 / d ** power
+    (сетка нерегулярная). Расстояния считаются в параметрах,
+    нормированных на их размах. Все точки обрабатываются одним вызовом
+    """
+    def __init__(self, names, params, tgrid, tables):
+        self.names = list(names)
+        self.params = np.asarray(params, dtype=float)
+        self.tgrid = np.asarray(tgrid, dtype=float)
+        self.tables = {name: np.asarray(tables[name], dtype=float) for name in QUANTITIES}
+        span = np.ptp(self.params, axis=0) if len(self.params) else np.ones(self.params.shape[1:])
+        self.scale = np.where(span > 0, span, 1.)
+
+    @classmethod
+    def from_grid(cls, grid, tgrid=TIME_GRID):
+        """
+        Таблицы эмулятора по ModelGrid. Модели, параметры
+        которых не читаются из имени, пропускаются
+        """
+        params = np.array([model_params(name) for name in grid.names], dtype=float).reshape(-1, 3)
+        known = np.flatnonzero((params >= 0).all(axis=1))
+        tables = {
+            'lbol': resample(grid.lbol_t, grid.lbol, grid.lbol_offsets, tgrid),
+            'MB': resample(grid.mag_t, grid.MB, grid.mag_offsets, tgrid),
+            'MV': resample(grid.mag_t, grid.MV, grid.mag_offsets, tgrid),
+        }
+        return cls([grid.names[i] for i in known], params[known], tgrid,
+                   {name: table[known] for name, table in tables.items()})
+
+    def save(self, path):
+        np.savez(path, names=np.array(self.names), params=self.params, tgrid=self.tgrid, **self.tables)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['names'], data['params'], data['tgrid'], {name: data[name] for name in QUANTITIES})
+
+    def neighbours(self, points, k=4, power=2.):
+        """
+        Ближайшие модели и их веса для каждой точки параметров.
+        Точка, совпадающая с моделью, получает только ее кривую
+        :param points: точки (m x 3)
+        :return: idx (m x k), weights (m x k)
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, self.params.shape[1])
+        d = np.sqrt((((points[:, None, :] - self.params[None]) / self.scale) ** 2).sum(axis=-1))
+        k = min(k, len(self.params))
+        idx = np.argpartition(d, k - 1, axis=1)[:, :k]
+        dk = np.take_along_axis(d, idx, axis=1)
+        exact = dk == 0
+        with np.errstate(divide='ignore'):
+            weights = np.where(exact.any(axis=1, keepdims=True), exact, 1 / dk ** power)
+        return idx, weights
+
+    def evaluate(self, points, quantity='lbol', t=None, k=4, power=2.):
+        """
+        Кривая quantity ('lbol', 'MB', 'MV') в точках параметров
+        :param points: точка (3) или точки (m x 3)
+        :param t: моменты времени, по умолчанию сетка tgrid
+        :return: значения (m x len(t)), для одной точки - (len(t))
+        """
+        single = np.ndim(points) == 1
+        idx, weights = self.neighbours(points, k, power)
+        table = self.tables[quantity]
+        if t is None:
+            values = table[idx]
+        else:
+            t = np.atleast_1d(np.asarray(t, dtype=float))
+            j = np.clip(np.searchsorted(self.tgrid, t) - 1, 0, len(self.tgrid) - 2)
+            frac = (t - self.tgrid[j]) / (self.tgrid[j + 1] - self.tgrid[j])
+            values = table[idx[..., None], j] * (1 - frac) + table[idx[..., None], j + 1] * frac
+            values[..., (t < self.tgrid[0]) | (t > self.tgrid[-1])] = np.nan
+
+        finite = np.isfinite(values)
+        weights = np.where(finite, weights[..., None], 0.)
+        total = weights.sum(axis=1)
+        with np.errstate(invalid='ignore'):
+            result = (weights * np.where(finite, values, 0.)).sum(axis=1) / total
+        return result[0] if single else result
+
+    def lattice(self, num=11):
+        """
+        Равномерная сетка точек в пределах параметров моделей
+        :return: точки (num ** 3 x 3)
+        """
+        axes = [np.linspace(lo, hi, num) for lo, hi in zip(self.params.min(axis=0), self.params.max(axis=0))]
+        return np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(axes))
+
+    def fit(self, t, values, quantity='MB', points=None, k=4, power=2.):
+        """
+        Точка параметров, кривая которой ближе всего к наблюдениям
+        (минимум среднего квадрата отклонения по моментам t)
+        :param t: время от взрыва, дни
+        :param points: точки-кандидаты, по умолчанию lattice()
+        :return: точка, среднеквадратичное отклонение
+        """
+        points = self.lattice() if points is None else np.asarray(points, dtype=float)
+        model = self.evaluate(points, quantity, t, k, power)
+        residual = (model - np.asarray(values, dtype=float)) ** 2
+        finite = np.isfinite(residual)
+        with np.errstate(invalid='ignore'):
+            rms = np.sqrt(np.where(finite, residual, 0.).sum(axis=1) / finite.sum(axis=1))
+        best = np.nanargmin(rms)
+        return points[best], rms[best]
@@ -0,0 +1,108 @@
+import os
+import numpy as np
+from .instrument import log, count, timed
+
+
+def read_waves(fname, key='WAVES:'):
+    """
+    Сетка длин волн (в ангстремах) из заголовка .res файла.
+    Файл читается построчно только до первого блока с результатами
+    """
+    waves = []
+    with open(fname) as f:
+        for line in f:
+            if line.startswith('%H'):
+                break
+            fields = line.split()
+            if fields and fields[0] == key:
+                waves.extend(float(value) for value in fields[1:])
+    return np.array(waves)
+
+
+class FlxReader(object):
+    """
+    Бинарный .flx файл STELLA: последовательность записей Fortran,
+    в каждой число моментов n и n структур (t, nfrus, flux[nflux]).
+    Поток на длине волны waves[k] - столбец flux[k], но только первые
+    nfrus столбцов момента - поток (число частот меняется от момента
+    к моменту), дальше нули-заполнители, последний столбец записи
+    не поток. Файл отображается в память, записи доступны как
+    представления без копирования
+    """
+    def __init__(self, mname, data_dir='raw_data'):
+        self.mname = mname
+        path = os.path.join('data', data_dir)
+        self.fname = os.path.join(path, mname + '.flx')
+        self.res_fname = os.path.join(path, mname + '.res')
+        self._waves = None
+        self.process_flx_file()
+
+    @timed('parse')
+    def process_flx_file(self):
+        """
+        Разбираем разметку записей, данные не копируются
+        """
+        log.debug(f"Reading flx file for run {self.mname}")
+        self.mm = np.memmap(self.fname, dtype=np.uint8, mode='r')
+        count('bytes_mapped', len(self.mm))
+        self.records = []
+        pos = 0
+        while pos + 8 <= len(self.mm):
+            length = int(np.frombuffer(self.mm, '<i4', 1, pos)[0])
+            n = int(np.frombuffer(self.mm, '<i4', 1, pos + 4)[0])
+            if n > 0:
+                nflux = ((length - 4) // n - 12) // 8
+                dtype = np.dtype([('t', '<f8'), ('nfrus', '<i4'), ('flux', '<f8', (nflux,))])
+                self.records.append(np.frombuffer(self.mm, dtype, n, pos + 8))
+            pos += length + 8
+
+        self.time = np.concatenate([record['t'] for record in self.records])
+        self.nfrus = np.concatenate([record['nfrus'] for record in self.records])
+        self.starts = np.cumsum([0] + [len(record) for record in self.records])
+        self.nflux = self.records[0].dtype['flux'].shape[0] if self.records else 0
+
+    @property
+    def waves(self):
+        """
+        Длины волн столбцов потока из заголовка .res файла модели
+        """
+        if self._waves is None:
+            self._waves = read_waves(self.res_fname)
+        return self._waves
+
+    @property
+    def ncol(self):
+        """
+        Число столбцов потока, для которых есть длина волны
+        и данные хотя бы в один момент
+        """
+        return int(min(len(self.waves), self.nfrus.max(initial=0)))
+
+    def epoch(self, i):
+        """
+        Спектр в момент с номером i, представление без копирования.
+        Длины волн спектра - waves[:len(flux)]
+        :return: t, flux (nfrus столбцов момента)
+        """
+        k = np.searchsorted(self.starts, i, side='right') - 1
+        row = self.records[k][i - self.starts[k]]
+        return row['t'], row['flux'][:min(row['nfrus'], len(self.waves))]
+
+    def select(self, t_min=-np.inf, t_max=np.inf, wl_min=0, wl_max=np.inf):
+        """
+        Поток в диапазоне времени и длин волн. Копируются только
+        выбранные моменты и длины волн. Столбцы за пределами
+        nfrus момента - nan
+        :return: time, waves, flux (моменты x длины волн)
+        """
+        waves = self.waves[:self.ncol]
+        columns = np.flatnonzero((waves >= wl_min) & (waves <= wl_max))
+        parts = []
+        for record in self.records:
+            rows = np.flatnonzero((record['t'] >= t_min) & (record['t'] <= t_max))
+            if rows.size:
+                part = record[rows[0]:rows[-1] + 1]
+                parts.append(np.where(columns < part['nfrus'][:, None], part['flux'][:, columns], np.nan))
+        flux = np.concatenate(parts) if parts else np.zeros((0, len(columns)))
+        time = self.time[(self.time >= t_min) & (self.time <= t_max)]
+        return time, waves[columns], flux
@@ -0,0 +1,348 @@
+import os
+import numpy as np
+from .cache import cached_loadtxt
+from .tt_read import MagReader, find_header
+from .times import model_mni, concat_curves, find_ta_tb_batch
+from .photometry import peak_metrics, decline_rates
+from . import prefetch
+from . import archive
+from .memo import MEMO, fingerprint
+from .instrument import log, timed
+
+
+def map_models(fn, names, cache='use', jobs=1, data_dir='raw_data', threads=None, cache_dir=None):
+    """
+    fn(name, cache, data_dir, cache_dir) для всех моделей: при jobs > 1 в пуле
+    процессов, иначе в пуле потоков чтения. Порядок совпадает с names
+    :param jobs: число процессов, 0 - по числу ядер
+    :param threads: число потоков чтения, по умолчанию prefetch.IO_THREADS
+    :param cache_dir: директория кэша, по умолчанию CACHE_DIR. Передается
+                      явно: процессы пула не видят изменений глобальных переменных
+    :return: список результатов
+    """
+    names = list(names)
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if threads is None:
+        threads = prefetch.IO_THREADS
+    if jobs > 1 and len(names) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        chunksize = max(1, len(names) // (4 * jobs))
+        with ProcessPoolExecutor(min(jobs, len(names))) as pool:
+            return list(pool.map(fn, names, [cache] * len(names), [data_dir] * len(names),
+                                 [cache_dir] * len(names), chunksize=chunksize))
+    if threads > 1 and len(names) > 1:
+        return list(prefetch.prefetch_map(lambda name: fn(name, cache, data_dir, cache_dir), names, threads))
+    return [fn(name, cache, data_dir, cache_dir) for name in names]
+
+
+def model_key(kind, mname, data_dir='raw_data', *params):
+    """
+    Ключ мемоизации: вид результата, модель, отпечаток ее .tt и .lbol
+    файлов и параметры расчета
+    """
+    path = os.path.join('data', data_dir)
+    files = (os.path.join(path, mname + '.tt'), os.path.join(path, mname + '.lbol'))
+    return (kind, os.path.abspath(path), mname, fingerprint(*files)) + params
+
+
+def memo_map(fn, names, cache='use', jobs=1, data_dir='raw_data', threads=None, cache_dir=None):
+    """
+    map_models с мемоизацией результатов в памяти процесса:
+    за один запуск файлы каждой модели читаются один раз.
+    При cache 'off' и 'rebuild' файлы читаются всегда, записи
+    памяти заменяются новыми результатами
+    """
+    names = list(names)
+    keys = [model_key(fn.__name__, name, data_dir) for name in names]
+    if cache == 'use':
+        results = [MEMO.get(key, disk=False) for key in keys]
+    else:
+        results = [None] * len(keys)
+    missing = [i for i, result in enumerate(results) if result is None]
+    loaded = map_models(fn, [names[i] for i in missing], cache, jobs, data_dir, threads, cache_dir)
+    for i, result in zip(missing, loaded):
+        MEMO.put(keys[i], result, disk=False)
+        results[i] = result
+    return results
+
+
+def load_curves(mname, cache='use', data_dir='raw_data', cache_dir=None):
+    """
+    Столбцы time, MB, MV .tt файла и time, L_bol .lbol файла модели
+    без построения читателей. Отсутствующий файл - пустая таблица.
+    Если в директории или архиве нет файлов этого вида (например,
+    только .lbol), предупреждение не выводится
+    :return: tt (n x 3), lbol (m x 2)
+    """
+    path = os.path.join('data', data_dir)
+    tt, lbol = np.zeros((0, 3)), np.zeros((0, 2))
+    fname = os.path.join(path, mname + '.tt')
+    try:
+        if archive.isfile(fname) or has_product(path, '.tt'):
+            header, names = find_header(fname)
+            usecols = [names.index(name) for name in MagReader.usecols]
+            tt = cached_loadtxt(fname, cache, cache_dir, skiprows=header + 1, usecols=usecols, dtype=float, ndmin=2)
+    except OSError:
+        log.warning(f'There is no data for {mname}.tt')
+    fname = os.path.join(path, mname + '.lbol')
+    try:
+        if archive.isfile(fname) or has_product(path, '.lbol'):
+            lbol = cached_loadtxt(fname, cache, cache_dir, skiprows=1, usecols=(0, 2), dtype=float, ndmin=2)
+    except OSError:
+        log.warning(f'There is no data for {mname}.lbol')
+    return tt, lbol
+
+
+def has_product(path, ext):
+    """
+    Есть ли в директории или архиве моделей файлы вида ext.
+    Недоступная директория считается содержащей все продукты
+    """
+    try:
+        return ext in archive.extensions(path)
+    except OSError:
+        return True
+
+
+def segment_min(values, offsets):
+    """
+    Минимум каждого отрезка склеенного массива, nan для пустых
+    """
+    offsets = np.asarray(offsets)
+    result = np.full(len(offsets) - 1, np.nan)
+    full = np.flatnonzero(np.diff(offsets) > 0)
+    if full.size:
+        result[full] = np.minimum.reduceat(values, offsets[:-1][full])
+    return result
+
+
+class ModelView(object):
+    """
+    Одна модель сетки: срезы общих буферов ModelGrid без копирования
+    """
+    __slots__ = ('grid', 'index')
+
+    def __init__(self, grid, index):
+        self.grid = grid
+        self.index = index
+
+    def __repr__(self):
+        return f'ModelView({self.name!r})'
+
+    @property
+    def name(self):
+        return self.grid.names[self.index]
+
+    @property
+    def mni(self):
+        return self.grid.mni[self.index]
+
+    def _mag(self, buffer):
+        offsets = self.grid.mag_offsets
+        return buffer[offsets[self.index]:offsets[self.index + 1]]
+
+    def _lbol(self, buffer):
+        offsets = self.grid.lbol_offsets
+        return buffer[offsets[self.index]:offsets[self.index + 1]]
+
+    @property
+    def tl(self):
+        return self._mag(self.grid.mag_t)
+
+    @property
+    def MB(self):
+        return self._mag(self.grid.MB)
+
+    @property
+    def MV(self):
+        return self._mag(self.grid.MV)
+
+    @property
+    def lbol_tl(self):
+        return self._lbol(self.grid.lbol_t)
+
+    @property
+    def lbol(self):
+        return self._lbol(self.grid.lbol)
+
+
+class ModelGrid(object):
+    """
+    Сетка моделей в виде структуры массивов: кривые блеска всех моделей
+    склеены в общие буферы, модель k занимает offsets[k]:offsets[k + 1].
+    Имена и индексы моделей хранятся только здесь
+    """
+    __slots__ = ('names', 'index', 'mni', 'mag_t', 'MB', 'MV', 'mag_offsets',
+                 'lbol_t', 'lbol', 'lbol_offsets')
+
+    def __init__(self, names, mag_t, MB, MV, mag_offsets, lbol_t, lbol, lbol_offsets):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.mni = np.array([model_mni(name) for name in self.names])
+        self.mag_t, self.MB, self.MV = mag_t, MB, MV
+        self.mag_offsets = np.asarray(mag_offsets)
+        self.lbol_t, self.lbol = lbol_t, lbol
+        self.lbol_offsets = np.asarray(lbol_offsets)
+
+    @classmethod
+    def from_tables(cls, names, tt, lbol):
+        """
+        Сетка из таблиц (time, MB, MV) и (time, L_bol) каждой модели
+        """
+        mag_t, MB, mag_offsets = concat_curves([(table[:, 0], table[:, 1]) for table in tt])
+        MV = np.concatenate([table[:, 2] for table in tt]) if tt else np.zeros(0)
+        lbol_t, lbol, lbol_offsets = concat_curves([(table[:, 0], table[:, 1]) for table in lbol])
+        return cls(names, mag_t, MB, MV, mag_offsets, lbol_t, lbol, lbol_offsets)
+
+    @classmethod
+    def load(cls, models, cache='use', jobs=1, bundle=None, data_dir='raw_data', threads=None, cache_dir=None):
+        """
+        Читаем кривые блеска моделей из файлов или из пакета сетки
+        :param models: {model: index}
+        :param bundle: GridBundle, из которого читаются модели вместо файлов
+        """
+        names = list(models.keys())
+        if bundle is not None:
+            columns = [bundle.tt_columns.index(name) for name in MagReader.usecols]
+            tables = [(bundle.tt_table(name)[:, columns], bundle.lbol_table(name)[:, [0, 2]]) for name in names]
+        else:
+            tables = memo_map(load_curves, names, cache, jobs, data_dir, threads, cache_dir)
+        return cls.from_tables(names, [tt for tt, _ in tables], [lbol for _, lbol in tables])
+
+    @classmethod
+    def from_readers(cls, mag_read=None, lbol_read=None):
+        """
+        Сетка из словарей читателей read_mag_reader / read_lbol_reader
+        """
+        names = list((mag_read if mag_read is not None else lbol_read).keys())
+        empty = np.zeros(0)
+        mag_curves, lbol_curves = [], []
+        for name in names:
+            mag = mag_read[name][0] if mag_read is not None else None
+            mag_curves.append(np.column_stack([mag.tl, mag.MB, mag.MV]) if hasattr(mag, 'tl')
+                              else np.zeros((0, 3)))
+            lbol = lbol_read[name][0] if lbol_read is not None and name in lbol_read else None
+            lbol_curves.append(np.column_stack([lbol.tl, lbol.lbol]) if hasattr(lbol, 'tl')
+                               else np.zeros((0, 2)))
+        return cls.from_tables(names, mag_curves, lbol_curves) if names else \
+            cls([], empty, empty, empty, [0], empty, empty, [0])
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __getitem__(self, key):
+        """
+        Модель по имени или номеру
+        """
+        return ModelView(self, self.index[key] if isinstance(key, str) else key)
+
+    def __iter__(self):
+        return (ModelView(self, i) for i in range(len(self.names)))
+
+    def models(self):
+        """
+        :return: {model: index}
+        """
+        return dict(self.index)
+
+    def has_mag(self):
+        return np.diff(self.mag_offsets) > 0
+
+    def has_lbol(self):
+        return np.diff(self.lbol_offsets) > 0
+
+    @timed('reduce')
+    def minB(self):
+        """
+        Максимум блеска в полосе B каждой модели
+        """
+        return segment_min(self.MB, self.mag_offsets)
+
+    def pf_relation(self, days=15.):
+        """
+        Спад блеска за days дней и максимум блеска в полосе V
+        :return: dm15, minV, short
+        """
+        t_peak, minV, dm15, short = peak_metrics(self.mag_t, self.MV, self.mag_offsets, days)
+        return dm15, minV, short
+
+    def decline_rates(self, band='V', days=(15.,)):
+        """
+        Скорость спада блеска после максимума в полосе band ('B', 'V')
+        :return: rate (модели x days), зв. величин в сутки, short
+        """
+        mag = {'B': self.MB, 'V': self.MV}[band]
+        t_peak, m_peak, rate, short = decline_rates(self.mag_t, mag, self.mag_offsets, days)
+        return rate, short
+
+    def find_times(self, eps=1e-5):
+        """
+        Времена ta, tb и светимости в эти моменты
+        :return: ta, tb, lbol_ta, lbol_tb
+        """
+        return find_ta_tb_batch(self.lbol_t, self.lbol, self.lbol_offsets, self.mni, eps)
+
+
+def memo_keys(kind, models, bundle=None, data_dir='raw_data', *params):
+    """
+    Ключи мемоизации моделей, для пакета сетки - по отпечатку пакета
+    """
+    if bundle is not None:
+        stamp = fingerprint(bundle.fname)
+        return [(kind, os.path.abspath(bundle.fname), name, stamp) + params for name in models]
+    return [model_key(kind, name, data_dir, *params) for name in models]
+
+
+def subset(models, rows):
+    """
+    Модели с номерами rows (по порядку models)
+    :return: {model: index}
+    """
+    names = list(models)
+    return {names[i]: models[names[i]] for i in rows}
+
+
+def load_subset(models, rows, cache='use', jobs=1, bundle=None, data_dir='raw_data', cache_dir=None):
+    """
+    ModelGrid только для моделей с номерами rows
+    """
+    return ModelGrid.load(subset(models, rows), cache, jobs, bundle, data_dir, cache_dir=cache_dir)
+
+
+def model_times(models, eps=1e-5, cache='use', jobs=1, bundle=None, data_dir='raw_data', cache_dir=None):
+    """
+    find_times с мемоизацией по (модель, отпечаток файлов, eps, Mni).
+    Файлы читаются, только если результата нет в памяти или на диске
+    :return: ta, tb, lbol_ta, lbol_tb
+    """
+    keys = memo_keys('times', models, bundle, data_dir, eps)
+    keys = [key + (model_mni(key[2]),) for key in keys]
+    table = MEMO.rows(keys, lambda missing: np.column_stack(
+        load_subset(models, missing, cache, jobs, bundle, data_dir, cache_dir).find_times(eps)), cache != 'use')
+    return tuple(np.asarray(table, dtype=float).reshape(-1, 4).T)
+
+
+def model_pf_relation(models, days=15., cache='use', jobs=1, bundle=None, data_dir='raw_data', cache_dir=None):
+    """
+    pf_relation с мемоизацией по (модель, отпечаток файлов, days)
+    :return: dm15, minV, short
+    """
+    keys = memo_keys('pf', models, bundle, data_dir, days)
+    table = MEMO.rows(keys, lambda missing: np.column_stack(
+        load_subset(models, missing, cache, jobs, bundle, data_dir, cache_dir).pf_relation(days)), cache != 'use')
+    table = np.asarray(table, dtype=float).reshape(-1, 3)
+    return table[:, 0], table[:, 1], table[:, 2].astype(bool)
+
+
+def model_minB(models, cache='use', jobs=1, bundle=None, data_dir='raw_data', cache_dir=None):
+    """
+    Максимум блеска в полосе B с мемоизацией по (модель, отпечаток файлов)
+    """
+    keys = memo_keys('minB', models, bundle, data_dir)
+    table = MEMO.rows(keys, lambda missing: load_subset(models, missing, cache, jobs, bundle, data_dir,
+                                                         cache_dir).minB()[:, None], cache != 'use')
+    return np.asarray(table, dtype=float).reshape(-1)
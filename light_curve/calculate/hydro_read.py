@@ -0,0 +1,125 @@
+import mmap
+import os
+import numpy as np
+from .struct_read import BlockReader, INDEX_DTYPE as BLOCK_INDEX
+from .instrument import log, count
+from . import prefetch
+
+
+# столбцы таблицы зон блока %H: (ZON AM/SOL R14. V8. T5. Trad5 lgD-6. lgP7. lgQv lgQRT
+# XHI ENG LUM CAPPA ZON n_bar n_e Fe II III accel)
+ZONE_COLUMNS = ('zone', 'am', 'r', 'v', 't', 'trad', 'lgd', 'lgp', 'lgqv', 'lgqrt', 'xhi', 'eng',
+                'lum', 'cappa', 'zone2', 'n_bar', 'n_e', 'fe', 'ii', 'iii', 'accel')
+ZONE_DTYPE = np.dtype([(name, 'f8') for name in ZONE_COLUMNS])
+INDEX_DTYPE = np.dtype(BLOCK_INDEX.descr + [('zones', 'i4')])
+
+MARKER = b'OBS.TIME='
+HEADER = b'  ZON'
+
+
+class HydroReader(BlockReader):
+    """
+    Чтение .res файла гидродинамического расчета STELLA
+    (HYDRODYNAMIC RUN OF MODEL ...) по эпохам: блок начинается строкой
+    OBS.TIME= блока %H:, по индексу блоков читается только таблица
+    зон нужной эпохи. Таблица зон есть не во всех блоках, число
+    ее строк хранится в индексе (zones)
+    """
+    ext = '.res'
+    index_dtype = INDEX_DTYPE
+
+    def block_time(self, line):
+        pos = line.find(MARKER)
+        if pos < 0:
+            return None
+        pos += len(MARKER)
+        return float(line[pos:line.find(b'D', pos)])
+
+    @staticmethod
+    def zone_lines(lines):
+        """
+        Строки таблицы зон: от заголовка ZON до следующей секции %
+        """
+        for k, line in enumerate(lines):
+            if line.startswith(HEADER):
+                table = []
+                for row in lines[k + 1:]:
+                    if row.startswith(b'%'):
+                        break
+                    table.append(row)
+                return table
+        return []
+
+    def parse_block(self, lines):
+        """
+        :return: зоны (ZONE_DTYPE)
+        """
+        table = self.zone_lines(lines)
+        if not table:
+            return np.zeros(0, dtype=ZONE_DTYPE)
+        table = np.loadtxt([line.decode('latin1') for line in table], dtype=float, ndmin=2)
+        return np.ascontiguousarray(table).view(ZONE_DTYPE).reshape(-1)
+
+    def index_row(self, offset, t, lines):
+        return super().index_row(offset, t, lines) + (len(self.zone_lines(lines)),)
+
+    def scan(self):
+        """
+        Проход по файлу через mmap без разбиения на строки:
+        ищутся только строки OBS.TIME= и заголовки таблиц зон
+        """
+        rows = []
+        if os.path.getsize(self.fname) == 0:
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        with open(self.fname, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            starts = []
+            pos = mm.find(MARKER)
+            while pos >= 0:
+                starts.append(mm.rfind(b'\n', 0, pos) + 1)
+                pos = mm.find(MARKER, pos + 1)
+            starts.append(len(mm))
+            for start, end in zip(starts[:-1], starts[1:]):
+                pos = mm.find(MARKER, start, end) + len(MARKER)
+                time = float(mm[pos:mm.find(b'D', pos, end)])
+                zones = 0
+                header = mm.find(b'\n' + HEADER, start, end)
+                if header >= 0:
+                    offset = mm.find(b'\n', header + 1, end) + 1
+                    stop = mm.find(b'\n%', offset - 1, end)
+                    stop = end if stop < 0 else stop + 1
+                    zones = mm[offset:stop].count(b'\n')
+                rows.append((time, start, end - start, zones))
+            count('bytes_read', len(mm))
+        return np.array(rows, dtype=INDEX_DTYPE)
+
+    def nearest(self, t, full=True):
+        """
+        Номер блока, ближайшего по времени к t
+        :param full: только блоки с таблицей зон
+        """
+        candidates = np.flatnonzero(self.index['zones'] > 0) if full else np.arange(len(self.index))
+        if not len(candidates):
+            raise ValueError(f'no blocks with zones in {self.fname}')
+        return int(candidates[np.argmin(np.abs(self.times[candidates] - t))])
+
+
+def hydro_at(models, times, cache='use', data_dir='raw_data', threads=None):
+    """
+    Структура оболочки каждой модели в заданный момент (например, ta
+    из model_times): читается только один блок каждого файла
+    :param times: время для каждой модели, дни
+    :return: список (время, зоны), для моделей без .res - (nan, пустая таблица)
+    """
+    def load(item):
+        name, t = item
+        try:
+            return HydroReader(name, data_dir, cache).at_time(t)
+        except (OSError, ValueError):
+            log.warning(f'There is no data for {name}.res')
+            return np.nan, np.zeros(0, dtype=ZONE_DTYPE)
+
+    items = list(zip(models, np.asarray(times, dtype=float)))
+    threads = prefetch.IO_THREADS if threads is None else threads
+    if threads > 1 and len(items) > 1:
+        return list(prefetch.prefetch_map(load, items, threads))
+    return [load(item) for item in items]
@@ -0,0 +1,140 @@
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+log = logging.getLogger('light_curve')
+
+
+def setup_log(level='INFO'):
+    """
+    Вывод сообщений пакета в stderr с уровнем level. Настраивается
+    только логгер light_curve, корневой логгер не трогаем, иначе
+    на DEBUG выводятся сообщения matplotlib и PIL
+    """
+    if not log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        log.addHandler(handler)
+    log.setLevel(level)
+    log.propagate = False
+
+
+class Stats(object):
+    """
+    Таймеры этапов (parse, reduce, match, render, ...) и счетчики
+    (прочитанные байты, попадания в кэш, ...). Учитывается только
+    текущий процесс, работа в пуле процессов сюда не попадает
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.timers = {}
+            self.counters = {}
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            calls, total = self.timers.get(name, (0, 0.))
+            self.timers[name] = (calls + 1, total + seconds)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        """
+        :return: {'timers': {этап: {'calls', 'seconds'}}, 'counters': {...}}
+        """
+        with self.lock:
+            return {
+                'timers': {name: {'calls': calls, 'seconds': total}
+                           for name, (calls, total) in sorted(self.timers.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+
+STATS = Stats()
+
+
+@contextmanager
+def timer(name):
+    """
+    Время выполнения блока добавляется к этапу name
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STATS.add_time(name, time.perf_counter() - start)
+
+
+_active = threading.local()
+
+
+def timed(name):
+    """
+    Декоратор: время выполнения функции добавляется к этапу name.
+    Вложенные вызовы того же этапа не учитываются дважды
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            stages = _active.__dict__.setdefault('stages', set())
+            if name in stages:
+                return fn(*args, **kwargs)
+            stages.add(name)
+            try:
+                with timer(name):
+                    return fn(*args, **kwargs)
+            finally:
+                stages.discard(name)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    STATS.count(name, n)
+
+
+@contextmanager
+def profile(prefix=None, top=30):
+    """
+    Профилирование блока: при заданном prefix пишем prefix.prof
+    (cProfile, для pstats и snakeviz) и prefix.json с таймерами,
+    счетчиками и top функций по суммарному времени
+    """
+    if not prefix:
+        yield
+        return
+    import cProfile
+    import io
+    import json
+    import pstats
+    profiler = cProfile.Profile()
+    STATS.reset()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        wall = time.perf_counter() - start
+        if os.path.dirname(prefix):
+            os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        profiler.dump_stats(f'{prefix}.prof')
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        functions = []
+        for (fname, line, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+            functions.append({'function': f'{fname}:{line}({func})', 'calls': nc,
+                              'tottime': tt, 'cumtime': ct})
+        functions.sort(key=lambda f: f['cumtime'], reverse=True)
+        summary = dict(STATS.summary(), wall=wall, functions=functions[:top])
+        with open(f'{prefix}.json', 'w') as f:
+            json.dump(summary, f, indent=1)
+        log.info(f'profile saved to {prefix}.prof and {prefix}.json')
@@ -1,32 +1,52 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from .parameters import Msun, T_Ni, T_Co, C_Co, C_Ni
+from .times import model_mni, deposition_lbol, find_ta_tb_batch
 import os
+from .cache import cached_loadtxt
+from .instrument import log
+from .render import pyplot
+from . import archive
 
 
 class LbolReader(object):
-    def __init__(self, mname, data_dir = 'raw_data'):
+    def __init__(self, mname, data_dir = 'raw_data', cache='use', cache_dir=None):
         self.mname = mname
+        self.cache = cache
+        self.cache_dir = cache_dir
         path = os.path.join('data', data_dir)
-        if os.path.isdir(path):
+        if archive.isdir(path):
             try:
                 self.fname = os.path.join(path, mname+".lbol")
                 self.process_lbol_file()
             except OSError:
-                print(f'There is no data for {mname}.lbol')
+                log.warning(f'There is no data for {mname}.lbol')
         else:
-            print("You have no data directory")
+            log.warning(f"You have no data directory {path}")
 
     def process_lbol_file(self):
         """
         Считываение lbol файл с кривой блеска
         """
-        print(f"Reading lbol file for run {self.mname}")
-        raw_data = np.loadtxt(self.fname, skiprows=1, dtype=float)
-        print(f"{self.fname} found and read\n")
+        log.debug(f"Reading lbol file for run {self.mname}")
+        raw_data = cached_loadtxt(self.fname, self.cache, self.cache_dir, skiprows=1, dtype=float)
+        log.debug(f"{self.fname} found and read")
         self.tl = raw_data[:, 0]
         self.lbol = raw_data[:, 2]
 
+    @classmethod
+    def from_table(cls, mname, table):
+        """
+        Читатель поверх уже разобранной таблицы .lbol
+        (например, из пакета всей сетки моделей)
+        """
+        self = cls.__new__(cls)
+        self.mname = mname
+        self.cache = 'off'
+        self.cache_dir = None
+        self.fname = None
+        self.tl = table[:, 0]
+        self.lbol = table[:, 2]
+        return self
+
     def find_ta_tb(self, eps=1e-5):
         """
         Находим времена ta и tb, когда кривая блеска
@@ -34,39 +54,28 @@ class LbolReader(object):
         :param eps:
         :return: ta, tb, lbol_ta, lbol_tb
         """
-        Mni = int(self.mname[2]) * 0.1
-        lbol_ni_bol = np.log10(Mni * (C_Ni * np.exp(-self.tl / T_Ni) + C_Co * np.exp(-self.tl / T_Co)))
-        lbol_lni = lbol_ni_bol - self.lbol
-
-        try:
-            ta = self.tl[lbol_lni < eps][0]
-            tb = self.tl[lbol_lni < eps][-1]
-            lbol_ta = self.lbol[lbol_lni < eps][0]
-            lbol_tb = self.lbol[lbol_lni < eps][-1]
-        except Exception as e:
-            print(f'cannot find times with error {e}')
-            ta = 0
-            tb = 0
-            lbol_ta = 0
-            lbol_tb = 0
-
-        return ta, tb, lbol_ta, lbol_tb
+        offsets = np.array([0, len(self.tl)])
+        ta, tb, lbol_ta, lbol_tb = find_ta_tb_batch(self.tl, self.lbol, offsets, [model_mni(self.mname)], eps)
+        if ta[0] == 0 and tb[0] == 0:
+            log.info(f'cannot find times for {self.mname}')
+        return ta[0], tb[0], lbol_ta[0], lbol_tb[0]
 
     def show_lbol_lightcurve(self, fig=None):
         """
         Построение кривых блеска
         """
+        plt = pyplot()
         if fig is None:
             fig = plt.figure(figsize=(10, 9), dpi=300)
         fig.set_size_inches(6, 5, forward=True)
 
         ax = fig.gca()
-        Mni = int(self.mname[2]) * 0.1
-        print(f'light curve for {self.mname} and Mni = {Mni} of solar masses')
-        lbol_ni_bol = np.log10(Mni * (C_Ni * np.exp(-self.tl /T_Ni) + C_Co * np.exp(-self.tl / T_Co)))
+        Mni = model_mni(self.mname)
+        log.info(f'light curve for {self.mname} and Mni = {Mni} of solar masses')
+        lbol_ni_bol = deposition_lbol(self.tl, Mni)
 
         ta, tb, lbol_ta, lbol_tb = self.find_ta_tb()
-        ax.set_xlabel(f't, дни')
+        ax.set_xlabel('t, дни')
         ax.set_ylabel(r'$\log{L}$, $\log$ Эрг/c')
         ax.plot(self.tl, lbol_ni_bol, color='black', linestyle='--', label=r'Логарифм светимости $\log{L_{\gamma}}$')
         ax.plot(self.tl, self.lbol, color='black', label='Логарифм светимости сверхновой')
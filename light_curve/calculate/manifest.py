@@ -0,0 +1,121 @@
+import json
+import os
+import numpy as np
+from .grid import ModelGrid
+from .instrument import log
+
+
+MANIFEST_PATH = os.path.join('data', 'grid_manifest.json')
+SOURCES = ('tt', 'lbol')
+
+
+class GridManifest(object):
+    """
+    Манифест сетки моделей: файлы каждой модели с отметками изменений
+    и вычисленные по ним величины minB, minV, dm15, ta, tb.
+    Пересчитываются только новые и измененные модели
+    """
+    def __init__(self, path=MANIFEST_PATH, data_dir='raw_data'):
+        self.path = path
+        self.data_dir = data_dir
+        self.source = os.path.join('data', data_dir)
+        self.entries = {}
+        if os.path.isfile(path):
+            try:
+                with open(path) as f:
+                    manifest = json.load(f)
+                if manifest.get('data_dir') == os.path.abspath(self.source):
+                    self.entries = manifest['models']
+            except (OSError, ValueError, KeyError):
+                log.warning(f'cannot read manifest {path}, it will be rebuilt')
+
+    def scan(self):
+        """
+        Файлы моделей директории с отметками изменений
+        :return: {model: {ext: stamp}}
+        """
+        files = {}
+        for entry in os.scandir(self.source):
+            if not entry.is_file():
+                continue
+            name, ext = os.path.splitext(entry.name)
+            st = entry.stat()
+            files.setdefault(name, {})[ext[1:]] = [st.st_mtime_ns, st.st_size]
+        return {name: files[name] for name in sorted(files) if 'tt' in files[name]}
+
+    def changed(self, files):
+        """
+        Новые модели и модели с измененными .tt или .lbol файлами
+        """
+        changed = []
+        for name, stamps in files.items():
+            old = self.entries.get(name, {}).get('files', {})
+            if any(old.get(ext) != stamps.get(ext) for ext in SOURCES):
+                changed.append(name)
+        return changed
+
+    def update(self, cache='use', jobs=1):
+        """
+        Обновляем манифест: пересчитываем величины для новых и
+        измененных моделей, удаляем исчезнувшие
+        :return: список пересчитанных моделей
+        """
+        files = self.scan()
+        changed = self.changed(files)
+
+        if changed:
+            log.info(f'updating {len(changed)} of {len(files)} models')
+            models = {name: i for i, name in enumerate(changed)}
+            grid = ModelGrid.load(models, cache, jobs, data_dir=self.data_dir)
+            dm15, minV, short = grid.pf_relation()
+            values = {'minB': grid.minB(), 'minV': minV, 'dm15': dm15}
+            ta, tb, *args = grid.find_times()
+            has_lbol = grid.has_lbol()
+
+            for k, name in enumerate(changed):
+                entry = {'files': files[name]}
+                for key in ('minB', 'minV', 'dm15'):
+                    value = values[key][k]
+                    entry[key] = float(value) if np.isfinite(value) else None
+                entry['ta'], entry['tb'] = (float(ta[k]), float(tb[k])) if has_lbol[k] else (None, None)
+                self.entries[name] = entry
+
+        for name in list(self.entries):
+            if name not in files:
+                del self.entries[name]
+            else:
+                self.entries[name]['files'] = files[name]
+
+        self.save()
+        return changed
+
+    def save(self):
+        """
+        Атомарная запись манифеста
+        """
+        path_dir = os.path.dirname(self.path)
+        if path_dir:
+            os.makedirs(path_dir, exist_ok=True)
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'data_dir': os.path.abspath(self.source), 'models': self.entries}, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def models(self):
+        """
+        :return: {model: index}
+        """
+        return {name: i for i, name in enumerate(self.entries)}
+
+    def scalars(self, models, key):
+        """
+        Величина key (minB, minV, dm15, ta, tb) для моделей в порядке models
+        """
+        return np.array([np.nan if self.entries[name][key] is None else self.entries[name][key]
+                         for name in models], dtype=float)
+
+    def times(self, models):
+        """
+        ta и tb из манифеста в виде результата find_times
+        """
+        return self.scalars(models, 'ta'), self.scalars(models, 'tb')
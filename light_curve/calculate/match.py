@@ -0,0 +1,28 @@
+import numpy as np
+from .instrument import timed
+
+
+@timed('match')
+def match_catalogue(x1, c, mag, MB=-19.48, alpha=0.154, beta=3.02, tol=0.5):
+    """
+    Для каждого объекта каталога SALT находим модели сетки, максимум
+    блеска которых попадает в коридор +-tol вокруг уравнения
+    стандартизации MB - alpha * x1 + beta * c. Модели упорядочиваются
+    по блеску один раз, коридоры ищутся бинарным поиском
+    :param x1, c: параметры SALT объектов
+    :param mag: максимум блеска моделей в полосе B
+    :return: offsets, models - модели объекта i: models[offsets[i]:offsets[i + 1]]
+    """
+    mag = np.asarray(mag, dtype=float)
+    z = MB - alpha * np.asarray(x1, dtype=float) + beta * np.asarray(c, dtype=float)
+
+    order = np.argsort(mag, kind='stable')
+    sorted_mag = mag[order]
+    lo = np.searchsorted(sorted_mag, z - tol, side='left')
+    hi = np.searchsorted(sorted_mag, z + tol, side='right')
+    counts = np.maximum(hi - lo, 0)
+
+    offsets = np.zeros(len(z) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    pos = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - lo, counts)
+    return offsets, order[pos]
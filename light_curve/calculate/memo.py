@@ -0,0 +1,169 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from .cache import store
+from . import archive
+from .instrument import log, count
+
+
+MEMO_SIZE = 4096
+MEMORY_SIZE = 256 * 2 ** 20
+DISK_SIZE = 64 * 2 ** 20
+
+
+def size_of(value):
+    """
+    Оценка размера значения в байтах: массивы numpy, в том числе
+    в кортежах и атрибутах объектов (читатели моделей)
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(size_of(item) for item in value)
+    if hasattr(value, '__dict__'):
+        return sum(item.nbytes for item in vars(value).values() if isinstance(item, np.ndarray))
+    return 0
+
+
+def fingerprint(*fnames):
+    """
+    Отпечаток исходных файлов: время изменения и размер каждого
+    (для файлов архива - archive.stamp), None для отсутствующих
+    """
+    stamps = []
+    for fname in fnames:
+        try:
+            stamps.append(archive.stamp(fname))
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+class Memo(object):
+    """
+    Мемоизация результатов по ключу (вид, модель, отпечаток файлов,
+    параметры). Первый уровень - LRU в памяти процесса с ограничением
+    числа записей и их размера, второй (необязательный) - .npy файлы
+    в директории с ограничением суммарного размера, вытесняются
+    давно не использованные
+    """
+    def __init__(self, maxsize=MEMO_SIZE, path=None, max_bytes=DISK_SIZE, max_memory=MEMORY_SIZE):
+        self.maxsize = maxsize
+        self.max_memory = max_memory
+        self.path = path
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.nbytes = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def disk(self, path, max_bytes=DISK_SIZE):
+        """
+        Включаем (path) или отключаем (None) уровень на диске
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def clear(self):
+        """
+        Очищаем уровень в памяти
+        """
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.nbytes = 0
+
+    def disk_path(self, key):
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.path, f'{name}.npy')
+
+    def get(self, key, disk=True):
+        """
+        Значение по ключу или None
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                count('memo_hits')
+                return self.entries[key]
+        if disk and self.path is not None:
+            path = self.disk_path(key)
+            try:
+                value = np.load(path)
+                os.utime(path)
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                self.put(key, value, disk=False)
+                with self.lock:
+                    self.hits += 1
+                count('memo_hits')
+                return value
+        with self.lock:
+            self.misses += 1
+        count('memo_misses')
+        return None
+
+    def put(self, key, value, disk=True):
+        """
+        Сохраняем значение. На диск пишутся только массивы,
+        размер директории проверяется в evict
+        """
+        with self.lock:
+            self.nbytes -= self.sizes.pop(key, 0)
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            self.sizes[key] = size_of(value)
+            self.nbytes += self.sizes[key]
+            while len(self.entries) > self.maxsize or (self.nbytes > self.max_memory and len(self.entries) > 1):
+                old, _ = self.entries.popitem(last=False)
+                self.nbytes -= self.sizes.pop(old)
+        if disk and self.path is not None:
+            try:
+                store(self.disk_path(key), np.asarray(value))
+            except OSError as e:
+                log.warning(f'cannot write memo {self.path} with error {e}')
+
+    def evict(self):
+        """
+        Удаляем давно не использованные файлы уровня на диске,
+        пока их суммарный размер больше max_bytes
+        """
+        if self.path is None or not os.path.isdir(self.path):
+            return
+        files = [entry for entry in os.scandir(self.path) if entry.name.endswith('.npy')]
+        files = sorted((entry.stat().st_mtime_ns, entry.stat().st_size, entry.path) for entry in files)
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def rows(self, keys, compute, refresh=False):
+        """
+        Строки таблицы по ключам моделей. Недостающие строки
+        считаются compute(missing) только для моделей с номерами
+        missing и сохраняются построчно
+        :param refresh: пересчитать все строки (cache 'off' и 'rebuild')
+        :return: таблица (модели x величины)
+        """
+        rows = [None] * len(keys) if refresh else [self.get(key) for key in keys]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            table = np.asarray(compute(missing))
+            for i, row in zip(missing, table):
+                self.put(keys[i], row)
+                rows[i] = row
+            self.evict()
+        return np.array(rows)
+
+
+MEMO = Memo()
@@ -0,0 +1,82 @@
+import numpy as np
+from .instrument import timed
+
+
+MC_DRAWS = 100000
+# элементов в одном блоке реализаций (N x объекты): ~8 Мб на массив float
+MC_BLOCK = 2 ** 20
+
+
+def chunks(draws, objects, block=MC_BLOCK):
+    """
+    Размеры блоков реализаций, чтобы в блоке было не больше
+    block элементов (N x объекты)
+    """
+    size = max(1, block // max(objects, 1))
+    for start in range(0, draws, size):
+        yield min(size, draws - start)
+
+
+def sample(read, n, rng):
+    """
+    n реализаций параметров стандартизации: x1 и c каждого объекта
+    по их погрешностям из файла SALT, MB, alpha, beta - общие
+    для всех объектов одной реализации
+    :return: x1, c (n x объекты), MB, alpha, beta (n x 1)
+    """
+    shape = (n, len(read.x1))
+    x1 = rng.normal(read.x1, read.err_x1, shape)
+    c = rng.normal(read.color, read.err_c, shape)
+    MB = rng.normal(read.MB, read.err_MB, (n, 1))
+    alpha = rng.normal(read.alpha, read.err_alpha, (n, 1))
+    beta = rng.normal(read.beta, read.err_beta, (n, 1))
+    return x1, c, MB, alpha, beta
+
+
+@timed('match')
+def stand_probability(read, mag, draws=MC_DRAWS, seed=None, block=MC_BLOCK):
+    """
+    Доля реализаций, в которых объект подходит уравнению
+    стандартизации (ResReader.stand_mask). Реализации обрабатываются
+    блоками, память не зависит от draws
+    :param mag: максимум блеска в полосе B для каждого объекта
+    :return: вероятность для каждого объекта
+    """
+    mag = np.asarray(mag, dtype=float)
+    rng = np.random.default_rng(seed)
+    hits = np.zeros(len(read.x1), dtype=np.int64)
+    for n in chunks(draws, len(read.x1), block):
+        hits += read.stand_mask(mag, *sample(read, n, rng)).sum(axis=0)
+    return hits / max(draws, 1)
+
+
+@timed('match')
+def match_probability(read, mag, tol=0.5, draws=MC_DRAWS, seed=None, block=MC_BLOCK):
+    """
+    Доля реализаций, в которых модель сетки попадает в коридор +-tol
+    объекта SALT (как в match_catalogue). Для каждой реализации коридор -
+    отрезок моделей, упорядоченных по блеску; границы отрезков
+    накапливаются разностным массивом, поэтому память - таблица
+    (объекты x модели) и блок реализаций
+    :param mag: максимум блеска моделей в полосе B
+    :return: вероятности (объекты x модели)
+    """
+    mag = np.asarray(mag, dtype=float)
+    objects, models = len(read.x1), len(mag)
+    order = np.argsort(mag, kind='stable')
+    sorted_mag = mag[order]
+    width = models + 1
+    rng = np.random.default_rng(seed)
+    bounds = np.zeros(objects * width, dtype=np.int64)
+    for n in chunks(draws, objects, block):
+        x1, c, MB, alpha, beta = sample(read, n, rng)
+        z = read.correlation_fun(x1, c, MB, alpha, beta)
+        rows = np.arange(objects) * width
+        lo = rows + np.searchsorted(sorted_mag, z - tol, side='left')
+        hi = rows + np.maximum(np.searchsorted(sorted_mag, z + tol, side='right'), lo - rows)
+        bounds += np.bincount(lo.ravel(), minlength=len(bounds))
+        bounds -= np.bincount(hi.ravel(), minlength=len(bounds))
+    hits = np.cumsum(bounds.reshape(objects, width), axis=1)[:, :models]
+    result = np.empty((objects, models))
+    result[:, order] = hits / max(draws, 1)
+    return result
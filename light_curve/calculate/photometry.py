@@ -0,0 +1,93 @@
+import numpy as np
+from .instrument import timed
+
+
+def segment_ids(offsets):
+    """
+    Номер кривой для каждого отсчета склеенного массива
+    """
+    offsets = np.asarray(offsets)
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def find_peaks(t, mag, offsets):
+    """
+    Максимум блеска (минимум звездной величины) каждой кривой,
+    для пустых кривых t_peak и m_peak - nan
+    :return: индекс максимума в склеенном массиве, t_peak, m_peak
+    """
+    offsets = np.asarray(offsets)
+    if len(t) == 0:
+        n = len(offsets) - 1
+        return np.zeros(n, dtype=np.int64), np.full(n, np.nan), np.full(n, np.nan)
+    seg = segment_ids(offsets)
+    order = np.lexsort((mag, seg))
+    ipeak = order[np.minimum(offsets[:-1], len(order) - 1)]
+    empty = offsets[1:] == offsets[:-1]
+    t_peak, m_peak = t[ipeak].astype(float), mag[ipeak].astype(float)
+    t_peak[empty] = np.nan
+    m_peak[empty] = np.nan
+    return ipeak, t_peak, m_peak
+
+
+def mag_at(t, mag, offsets, tq):
+    """
+    Звездная величина каждой кривой в момент tq (свой для каждой
+    кривой), линейная интерполяция между соседними отсчетами.
+    Время внутри кривой должно не убывать
+    :return: mag(tq), short - последний отсчет кривой раньше tq
+    """
+    offsets = np.asarray(offsets)
+    n = len(offsets) - 1
+    tq = np.asarray(tq, dtype=float)
+    if len(t) == 0:
+        return np.full(n, np.nan), np.ones(n, dtype=bool)
+
+    # сдвигаем кривые по времени, чтобы склеенный массив был упорядочен
+    span = max(t.max(), np.nanmax(tq, initial=t.max())) - t.min() + 1
+    shift = np.arange(n) * span
+    # side='left': кривая, заканчивающаяся ровно в tq, не считается короткой
+    j = np.searchsorted(t + shift[segment_ids(offsets)], tq + shift, side='left')
+
+    short = j >= offsets[1:]
+    early = (j <= offsets[:-1]) & ~short
+    j = np.clip(j, np.maximum(offsets[:-1], 1), np.maximum(offsets[1:] - 1, 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = (tq - t[j - 1]) / (t[j] - t[j - 1])
+        result = mag[j - 1] + frac * (mag[j] - mag[j - 1])
+    result[short] = np.nan
+    result[early] = mag[offsets[:-1][early]]
+    return result, short
+
+
+@timed('reduce')
+def peak_metrics(t, mag, offsets, days=15.):
+    """
+    Время и величина максимума блеска и спад блеска за days дней
+    после максимума (dm15 при days=15) для всех кривых сразу.
+    Скорость спада - decline_rates
+    :return: t_peak, m_peak, dm, short - кривая короче t_peak + days
+    """
+    ipeak, t_peak, m_peak = find_peaks(t, mag, offsets)
+    m_days, short = mag_at(t, mag, offsets, t_peak + days)
+    return t_peak, m_peak, np.abs(m_days - m_peak), short
+
+
+@timed('reduce')
+def decline_rates(t, mag, offsets, days=(15.,)):
+    """
+    Скорость спада блеска после максимума dm / days (зв. величин
+    в сутки, положительная при падении блеска) на нескольких
+    интервалах сразу, в любой полосе mag
+    :param days: интервалы после максимума, дни
+    :return: t_peak, m_peak, rate (кривые x days), short (кривые x days) -
+             кривая короче t_peak + days, rate - nan
+    """
+    days = np.atleast_1d(np.asarray(days, dtype=float))
+    ipeak, t_peak, m_peak = find_peaks(t, mag, offsets)
+    rate = np.empty((len(t_peak), len(days)))
+    short = np.empty((len(t_peak), len(days)), dtype=bool)
+    for k, d in enumerate(days):
+        m_days, short[:, k] = mag_at(t, mag, offsets, t_peak + d)
+        rate[:, k] = (m_days - m_peak) / d
+    return t_peak, m_peak, rate, short
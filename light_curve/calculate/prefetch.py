@@ -0,0 +1,26 @@
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# число потоков чтения по умолчанию, 1 - читать последовательно
+IO_THREADS = 8
+
+
+def prefetch_map(fn, items, limit=8):
+    """
+    fn(item) для всех items в пуле потоков. Одновременно выполняется
+    не больше limit вызовов и не больше 2 * limit результатов ждут
+    своей очереди, пока обрабатываются предыдущие. Потоки подходят
+    для чтения файлов: ожидание диска или сетевой файловой системы
+    перекрывается с разбором уже прочитанных файлов.
+    Результаты выдаются в порядке items
+    :param limit: число потоков
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max(1, limit)) as pool:
+        pending = deque(pool.submit(fn, item) for item in itertools.islice(items, 2 * limit))
+        while pending:
+            result = pending.popleft().result()
+            pending.extend(pool.submit(fn, item) for item in itertools.islice(items, 1))
+            yield result
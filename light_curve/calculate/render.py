@@ -0,0 +1,185 @@
+import os
+import numpy as np
+from .times import deposition_lbol
+from .instrument import timed
+
+
+PF_M15 = np.arange(0.7, 1.85, 0.1)
+
+
+def pyplot():
+    """
+    matplotlib.pyplot импортируется при первом графике: импорт
+    занимает большую часть запуска, а для расчетов не нужен
+    """
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def format_grid(ax):
+    """
+    Сетка осей, общая для всех графиков
+    """
+    ax.minorticks_on()
+    ax.grid(which='minor', color='black', linestyle=':')
+    ax.grid(which='major', color='black', linestyle=':')
+
+
+def draw_pf(ax, dm15, minV, short, band='V', m15=PF_M15):
+    """
+    Соотношение Псковского-Филлипса: все модели одним scatter
+    """
+    ax.scatter(dm15[~short], minV[~short], color='dimgray', marker='.')
+
+    format_grid(ax)
+    ax.set_xlim([min(m15), max(m15)])
+    ax.set_ylim([-15, -22])
+    ax.set_xlabel(r"$\Delta m_{15}$")
+    ax.set_ylabel(f"$M_{{{os.path.basename(band)}}}$")
+
+    a = -20.883
+    b = 1.949
+    mV = a + b * m15
+    err = np.sqrt(0.417)
+    ax.fill_between(m15, mV - err, mV + err, alpha=0.2, color='black')
+
+
+def draw_times(ax, values, label, ylim):
+    """
+    Времена ta или tb всех моделей одним scatter
+    """
+    ax.scatter(np.arange(len(values)), values, color='grey')
+
+    ax.set_xlabel(r"model", fontsize=12)
+    ax.set_ylabel(label, fontsize=12)
+    ax.set_ylim(ylim)
+    format_grid(ax)
+
+
+def draw_lbol(ax, tl, lbol, offsets, mni, times):
+    """
+    Кривые блеска моделей и кривые депозиции: по одной коллекции
+    линий на серию, точки ta и tb - одним scatter
+    :param times: результат find_times для этих моделей
+    """
+    from matplotlib.collections import LineCollection
+    offsets = np.asarray(offsets)
+    seg = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    deposition = deposition_lbol(tl, np.asarray(mni, dtype=float)[seg])
+    curves = np.split(np.column_stack([tl, lbol]), offsets[1:-1])
+    depositions = np.split(np.column_stack([tl, deposition]), offsets[1:-1])
+    ax.add_collection(LineCollection(depositions, colors='black', linestyles='--',
+                                     label=r'Логарифм светимости $\log{L_{\gamma}}$'))
+    ax.add_collection(LineCollection(curves, colors='black', label='Логарифм светимости сверхновой'))
+
+    ta, tb, lbol_ta, lbol_tb = times
+    found = (ta != 0) | (tb != 0)
+    ax.scatter(np.r_[ta[found], tb[found]], np.r_[lbol_ta[found], lbol_tb[found]], color='black')
+    if len(ta) == 1 and found[0]:
+        ax.text(ta[0] - 1, lbol_ta[0] - 0.3, r'$t_A$', fontsize=18)
+        ax.text(tb[0] - 2, lbol_tb[0] - 0.3, r'$t_B$', fontsize=18)
+
+    ax.set_xlabel('t, дни')
+    ax.set_ylabel(r'$\log{L}$, $\log$ Эрг/c')
+    ax.set_xlim([0, 60])
+    ax.set_ylim([40, 43])
+    format_grid(ax)
+
+
+def draw_correlation(ax, read, mag):
+    """
+    Поверхность стандартизации и объекты SALT: подходящие
+    и неподходящие объекты - по одному scatter
+    :param read: ResReader с параметрами объектов
+    """
+    read.error_surfaces(ax)
+    selected = read.stand_mask(mag)
+    ax.scatter(read.x1[selected], read.color[selected], mag[selected],
+               linewidth=1, marker='o', alpha=1, c='black')
+    ax.scatter(read.x1[~selected], read.color[~selected], mag[~selected],
+               linewidth=1, marker='^', alpha=1, c='black')
+
+    ax.set_xlabel(r' $x_1$ ', fontsize=18)
+    ax.set_ylabel(r' c ', fontsize=18)
+    ax.set_zlabel(r' $M_B^*$ ', fontsize=18)
+    ax.view_init(10, -25)
+    ax.xaxis.set_rotate_label(False)
+    ax.yaxis.set_rotate_label(False)
+
+
+DRAW = {
+    'pf': draw_pf,
+    'times': draw_times,
+    'lbol': draw_lbol,
+    'correlation': draw_correlation,
+}
+
+
+@timed('render')
+def render_figure(spec):
+    """
+    Рисуем один график без дисплея (холст Agg) и сохраняем в файл
+    :param spec: (вид графика, путь, dpi, аргументы функции рисования)
+    :return: путь
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    kind, path, dpi, args = spec
+    fig = Figure(figsize=(6, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111, projection='3d' if kind == 'correlation' else None)
+    DRAW[kind](ax, *args)
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+def render_all(specs, jobs=1):
+    """
+    Рисуем графики, при jobs > 1 параллельно в пуле процессов
+    :param jobs: число процессов, 0 - по числу ядер
+    :return: пути к файлам
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if jobs > 1 and len(specs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(min(jobs, len(specs))) as pool:
+            return list(pool.map(render_figure, specs))
+    return [render_figure(spec) for spec in specs]
+
+
+def correlation_figure(read, mag, path_to_save='graphics', dpi=300):
+    """
+    Описание графика поверхности стандартизации для render_all
+    :param mag: максимум блеска в полосе B для объектов read
+    """
+    os.makedirs(path_to_save, exist_ok=True)
+    return 'correlation', os.path.join(path_to_save, 'correlation.jpeg'), dpi, (read, mag)
+
+
+def grid_figures(grid, path_to_save='graphics', num=10, dpi=300, times=None):
+    """
+    Описания всех графиков для сетки моделей: PF, ta, tb
+    и кривые блеска первых num моделей
+    :param grid: ModelGrid
+    :param times: результат find_times, если уже посчитан
+    :return: список описаний для render_all
+    """
+    os.makedirs(path_to_save, exist_ok=True)
+    if times is None:
+        times = grid.find_times()
+    ta, tb = times[0], times[1]
+    specs = [
+        ('pf', os.path.join(path_to_save, 'PF.jpeg'), dpi, grid.pf_relation()),
+        ('times', os.path.join(path_to_save, 'ta.png'), dpi, (ta, r"$t_A$", [5, 30])),
+        ('times', os.path.join(path_to_save, 'tb.eps'), dpi, (tb, r"$t_B$", [3, 65])),
+    ]
+    if num:
+        if len(times) < 4:
+            times = grid.find_times()
+        num = min(num, len(grid))
+        end = grid.lbol_offsets[num]
+        specs.append(('lbol', os.path.join(path_to_save, 'lbol.eps'), dpi,
+                      (grid.lbol_t[:end], grid.lbol[:end], grid.lbol_offsets[:num + 1],
+                       grid.mni[:num], tuple(x[:num] for x in times))))
+    return specs
@@ -1,10 +1,14 @@
 import os
 import numpy as np
-import matplotlib.pyplot as plt
 from .tt_read import MagReader
 from .lbol_read import LbolReader
-from .parameters import Msun, c
-import matplotlib
+from .match import match_catalogue
+from .montecarlo import MC_DRAWS, stand_probability, match_probability
+from .photometry import peak_metrics
+from .grid import ModelGrid, memo_map, model_minB
+from .synphot import grid_magnitudes
+from .render import draw_pf, draw_times, draw_lbol, draw_correlation, PF_M15, pyplot
+from .instrument import log, timed
 
 #matplotlib.rcParams.update({'font.size': 12, 'figure.figsize':(10,9), 
     #'lines.linewidth': 1.5, 'figure.dpi': 300, 'lines.markersize' : 5})
@@ -18,16 +22,22 @@ class ResReader(object):
     def process_res_file(self):
         """
         Считываем данные из файла. Получаем имена стандартизированных
-        кривых блеска, а также параметры стандартизации x1 и color
+        кривых блеска, параметры стандартизации x1 и color
+        и их погрешности, а также погрешность t0
         """
-        print(f"Reading res file for run {self.fname}")
-        raw_data = np.loadtxt(self.fname, skiprows=1, usecols=(7, 9), dtype=float, delimiter=',')
+        log.debug(f"Reading res file for run {self.fname}")
+        raw_data = np.loadtxt(self.fname, skiprows=1, usecols=(4, 7, 8, 9, 10), dtype=float, delimiter=',',
+                              ndmin=2)
         name_data = np.loadtxt(self.fname, skiprows=1, usecols=1, dtype=str, delimiter=',')
-        print(f"{self.fname} found and read")
-
-        self.mname = {name_data[i]: i for i in range(len(name_data))}
-        self.x1 = raw_data[:, 0]
-        self.color = raw_data[:, 1]
+        log.debug(f"{self.fname} found and read")
+
+        self.names = np.atleast_1d(name_data)
+        self.mname = {str(name): i for i, name in enumerate(self.names)}
+        self.err_t0 = raw_data[:, 0]
+        self.x1 = raw_data[:, 1]
+        self.err_x1 = raw_data[:, 2]
+        self.color = raw_data[:, 3]
+        self.err_c = raw_data[:, 4]
         self.set_cosmology_parameters()
 
     def set_cosmology_parameters(self):
@@ -37,13 +47,22 @@ class ResReader(object):
         self.MB = -19.48
         self.alpha = 0.154
         self.beta = 3.02
+        # погрешности MB, alpha, beta для stand_probability и match_probability,
+        # по умолчанию учитываются только погрешности x1 и c из файла
+        self.err_MB = 0.
+        self.err_alpha = 0.
+        self.err_beta = 0.
 
-    def correlation_fun(self, x, y):
+    def correlation_fun(self, x, y, MB=None, alpha=None, beta=None):
         """
         Функция стандартизации, зависящая от космологических
-        параметров
+        параметров (по умолчанию set_cosmology_parameters).
+        Аргументы могут быть массивами реализаций
         """
-        return self.MB - self.alpha * x + self.beta * y
+        MB = self.MB if MB is None else MB
+        alpha = self.alpha if alpha is None else alpha
+        beta = self.beta if beta is None else beta
+        return MB - alpha * x + beta * y
 
     def error_surfaces(self, ax):
         """
@@ -58,96 +77,143 @@ class ResReader(object):
         ax.plot_surface(X, Y, Z_er_1, color='gray', alpha=0.5)
         ax.plot_surface(X, Y, Z_er_2, color='gray', alpha=0.5)
 
-    def find_stand_data(self, mag):
-        _x1 = self.x1
-        _c = self.color
-        Z1 = self.correlation_fun(_x1, _c) - 0.5
-        Z2 = self.correlation_fun(_x1, _c) + 0.5
+    def stand_mask(self, mag, x1=None, c=None, MB=None, alpha=None, beta=None):
+        """
+        Объекты, подходящие уравнению стандартизации. Параметры
+        по умолчанию из файла, массивы реализаций (N x объекты)
+        обрабатываются сразу
+        """
+        _x1 = self.x1 if x1 is None else x1
+        _c = self.color if c is None else c
+        Z = self.correlation_fun(_x1, _c, MB, alpha, beta)
+        Z1 = Z - 0.5
+        Z2 = Z + 0.5
 
         y = np.sqrt(_x1 ** 2 + _c ** 2 + mag ** 2) >= np.sqrt(_x1 ** 2 + _c ** 2 + Z2 ** 2)
-        y2 = np.sqrt(_x1 ** 2 + _c ** 2 + mag ** 2) * y <= np.sqrt(_x1 ** 2 + _c ** 2 + Z1 ** 2)
+        return np.sqrt(_x1 ** 2 + _c ** 2 + mag ** 2) * y <= np.sqrt(_x1 ** 2 + _c ** 2 + Z1 ** 2)
+
+    @timed('match')
+    def find_stand_data(self, mag):
+        y2 = self.stand_mask(mag)
+        return {str(self.names[i]): int(i) for i in np.flatnonzero(y2) if self.mname[self.names[i]] == i}
 
-        model = {}
-        for (num_mod, i) in zip(self.mname.keys(), self.mname.values()):
-            if y2[i]:
-                model[num_mod] = i
-        return model
+    def match_grid(self, mag, tol=0.5):
+        """
+        Модели сетки с максимумом блеска mag, подходящие каждому
+        объекту SALT по уравнению стандартизации
+        :return: offsets, models - модели объекта i: models[offsets[i]:offsets[i + 1]]
+        """
+        return match_catalogue(self.x1, self.color, mag, self.MB, self.alpha, self.beta, tol)
+
+    def stand_probability(self, mag, draws=MC_DRAWS, seed=None):
+        """
+        Вероятность объектов подойти уравнению стандартизации с учетом
+        погрешностей x1, c, MB, alpha, beta (метод Монте-Карло)
+        :return: {объект: вероятность}
+        """
+        p = stand_probability(self, mag, draws, seed)
+        return {str(self.names[i]): float(p[i]) for i in range(len(p)) if self.mname[self.names[i]] == i}
 
+    def match_probability(self, mag, tol=0.5, draws=MC_DRAWS, seed=None):
+        """
+        Вероятность совпадения каждой модели сетки с каждым объектом SALT
+        с учетом погрешностей (метод Монте-Карло)
+        :return: таблица (объекты x модели)
+        """
+        return match_probability(self, mag, tol, draws, seed)
+
+    @timed('render')
     def plot_surface(self, mag, fig=None):
         """
         Строим поверхность стандартизации
         """
+        plt = pyplot()
         if fig == None:
             fig = plt.figure()
         fig.set_size_inches(6, 5, forward=True)
         ax = fig.add_subplot(111, projection='3d')
+        draw_correlation(ax, self, mag)
 
-        self.error_surfaces(ax)
-        _x1 = self.x1
-        _c = self.color
-        Z1 = self.correlation_fun(_x1, _c) - 0.5
-        Z2 = self.correlation_fun(_x1, _c) + 0.5
 
-        y = np.sqrt(_x1 ** 2 + _c ** 2 + mag ** 2) >= np.sqrt(_x1 ** 2 + _c ** 2 + Z2 ** 2)
-        y2 = np.sqrt(_x1 ** 2 + _c ** 2 + mag ** 2) * y <= np.sqrt(_x1 ** 2 + _c ** 2 + Z1 ** 2)
+def load_lbol(num_mod, cache='use', data_dir='raw_data', cache_dir=None):
+    """
+    Читатель .lbol файла одной модели (для пула процессов)
+    """
+    return LbolReader(num_mod, data_dir, cache, cache_dir)
 
-        ax.set_xlabel(r' $x_1$ ', fontsize=18)
-        ax.set_ylabel(r' c ', fontsize=18)
-        ax.set_zlabel(r' $M_B^*$ ', fontsize=18)
-        ax.view_init(10, -25)
 
-        model = {}
-        for (num_mod, i) in zip(self.mname.keys(), self.mname.values()):
-            if y2[i]:
-                ax.scatter(self.x1[i], self.color[i], mag[i], linewidth=1, marker='o', alpha=1, c='black');
-                model[num_mod] = i
-            else:
-                ax.scatter(self.x1[i], self.color[i], mag[i], linewidth=1, marker='^', alpha=1, c='black');
-        ax.xaxis.set_rotate_label(False)
-        ax.yaxis.set_rotate_label(False)
+def load_mag(num_mod, cache='use', data_dir='raw_data', cache_dir=None):
+    """
+    Читатель .tt файла одной модели (для пула процессов)
+    """
+    return MagReader(num_mod, data_dir, cache, cache_dir)
 
 
-def read_lbol_reader(models):
+def load_readers(loader, models, cache='use', jobs=1, data_dir='raw_data', threads=None, cache_dir=None):
+    """
+    Строим читатели для всех моделей, при jobs > 1 параллельно
+    в пуле процессов, иначе с чтением файлов в пуле потоков.
+    Порядок совпадает с порядком models
+    :param jobs: число процессов, 0 - по числу ядер
+    :param threads: число потоков чтения, по умолчанию prefetch.IO_THREADS
+    :param cache_dir: директория кэша, по умолчанию CACHE_DIR
+    :return: {model: [reader, index]}
+    """
+    names = list(models.keys())
+    readers = memo_map(loader, names, cache, jobs, data_dir, threads, cache_dir)
+    return {name: [reader, models[name]] for name, reader in zip(names, readers)}
+
+
+def read_lbol_reader(models, cache='use', jobs=1, bundle=None, data_dir='raw_data', threads=None, cache_dir=None):
     """
     Считываем из models кривые блеска
+    :param cache: режим бинарного кэша 'use', 'rebuild' или 'off'
+    :param jobs: число процессов для параллельного чтения
+    :param bundle: GridBundle, из которого читаются модели вместо файлов
+    :param data_dir: директория моделей внутри data
+    :param threads: число потоков чтения файлов
     :return: lbol
     """
-    lbol_read = {}
-    for num_mod, i in zip(models.keys(), models.values()):
-        lbol_read[num_mod] = [LbolReader(num_mod), i]
-    return lbol_read
+    if bundle is not None:
+        return {num_mod: [bundle.lbol_reader(num_mod), i] for num_mod, i in models.items()}
+    return load_readers(load_lbol, models, cache, jobs, data_dir, threads, cache_dir)
 
 
-def read_mag_reader(models):
+def read_mag_reader(models, cache='use', jobs=1, bundle=None, data_dir='raw_data', threads=None, cache_dir=None):
     """
     Считываем из models максимум кривой блеска в полосе B
+    :param cache: режим бинарного кэша 'use', 'rebuild' или 'off'
+    :param jobs: число процессов для параллельного чтения
+    :param bundle: GridBundle, из которого читаются модели вместо файлов
+    :param data_dir: директория моделей внутри data
+    :param threads: число потоков чтения файлов
     :return: minMB
     """
-    mag_read = {}
-    for num_mod, i in zip(models.keys(), models.values()):
-        mag_read[num_mod] = [MagReader(num_mod), i]
-    return mag_read
+    if bundle is not None:
+        return {num_mod: [bundle.mag_reader(num_mod), i] for num_mod, i in models.items()}
+    return load_readers(load_mag, models, cache, jobs, data_dir, threads, cache_dir)
 
 
-def find_appropriate_models(read, data):
+def find_appropriate_models(read, data, cache='use', jobs=1, bundle=None):
     """
     Считываем подходящие модели сверхновых на основе
     уравнения стандартизации
     :return: models
     """
-    mag_read = read_mag_reader(data)
-    minMB = np.array([mag_read[name][0].minB for name in mag_read.keys()])
+    minMB = model_minB(data, cache, jobs, bundle)
     return read.find_stand_data(minMB)
 
 
-def plot_correlation(read, models, path_to_save='graphics'):
+def plot_correlation(read, models, path_to_save='graphics', cache='use', jobs=1, bundle=None, minMB=None):
     """
     Построение поверхности стандартизации
+    :param minMB: максимум блеска моделей, если уже получен (например, с сервера)
     """
+    plt = pyplot()
     #try:
-    print(models)
-    mag_read = read_mag_reader(models)
-    minMB = np.array([mag_read[name][0].minB for name in mag_read.keys()])
+    log.debug(models)
+    if minMB is None:
+        minMB = model_minB(models, cache, jobs, bundle)
     read.plot_surface(minMB)
 
     if os.path.isdir(path_to_save):  
@@ -172,22 +238,40 @@ def reading_results(path="standart_data", data='results_SALT.txt'):
             read = ResReader(file)
             return read
         except OSError:
-            print('There is no results for SALT')
+            log.warning('There is no results for SALT')
     else:
-        print("You have no standart_data directory")
+        log.warning(f"You have no standart_data directory {path}")
+
+
+def find_times(lbol_read, eps=1e-5):
+    """
+    Времена ta, tb и светимости в эти моменты для всех
+    моделей за один векторизованный проход
+    :param lbol_read: ModelGrid или результат read_lbol_reader
+    :return: ta, tb, lbol_ta, lbol_tb в порядке lbol_read
+    """
+    if not isinstance(lbol_read, ModelGrid):
+        lbol_read = ModelGrid.from_readers(lbol_read=lbol_read)
+    return lbol_read.find_times(eps)
 
 
+@timed('render')
 def show_lbol(lbol_read, num, path_to_save="graphics", fig=None):
     """
     Построение кривых блеска для различных моделей
     """
+    plt = pyplot()
     if fig is None:
         fig = plt.figure()
     #fig.set_size_inches(6, 5, forward=True)
 
-    keys = list(lbol_read.keys())
-    for name in keys[:num]:
-        lbol_read[name][0].show_lbol_lightcurve(fig)
+    if not isinstance(lbol_read, ModelGrid):
+        lbol_read = ModelGrid.from_readers(lbol_read=lbol_read)
+    num = min(num, len(lbol_read))
+    end = lbol_read.lbol_offsets[num]
+    times = tuple(x[:num] for x in lbol_read.find_times())
+    draw_lbol(fig.gca(), lbol_read.lbol_t[:end], lbol_read.lbol[:end], lbol_read.lbol_offsets[:num + 1],
+              lbol_read.mni[:num], times)
 
     if os.path.isdir(path_to_save):  
         plt.grid()
@@ -208,28 +292,21 @@ def show_lbol(lbol_read, num, path_to_save="graphics", fig=None):
         plt.show()
 
 
-def plot_ta(lbol_read, fig=None, path_to_save="graphics"):
+@timed('render')
+def plot_ta(lbol_read, fig=None, path_to_save="graphics", times=None):
     """
     Построение зависимости отношения tb/td
+    :param times: результат find_times, если уже посчитан
     """
+    plt = pyplot()
     if fig is None:
         fig = plt.figure()
     #fig.set_size_inches(6, 5, forward=True)
     ax = fig.gca()
-    name = list(lbol_read.keys())
-
-    for i, mname in enumerate(name):
-        ta, tb, *args = lbol_read[mname][0].find_ta_tb()
-        ax.scatter(i, ta, label=mname, color='grey')
-        
-    ax.set_xlabel(r"model", fontsize=12)
-    ax.set_ylabel(r"$t_A$", fontsize=12)
-
-    ax.set_ylim([5,30])
-
-    ax.minorticks_on()
-    ax.grid(which='minor', color='black', linestyle=':')
-    ax.grid(which='major', color='black', linestyle=':')
+    if times is None:
+        times = find_times(lbol_read)
+    ta = times[0]
+    draw_times(ax, ta, r"$t_A$", [5, 30])
 
     if os.path.isdir(path_to_save):
         path = os.path.join(path_to_save,"ta.png")
@@ -241,27 +318,21 @@ def plot_ta(lbol_read, fig=None, path_to_save="graphics"):
     return ta
 
 
-def plot_tb(lbol_read, fig=None, path_to_save="graphics"):
+@timed('render')
+def plot_tb(lbol_read, fig=None, path_to_save="graphics", times=None):
     """
     Построение зависимости отношения tb/td
+    :param times: результат find_times, если уже посчитан
     """
+    plt = pyplot()
     if fig is None:
         fig = plt.figure()
     #fig.set_size_inches(6, 5, forward=True)
     ax = fig.gca()
-    name = list(lbol_read.keys())
-    for i, mname in enumerate(name):
-        ta, tb, *args = lbol_read[mname][0].find_ta_tb()
-        ax.scatter(i, tb, label=mname, color='grey')
-
-    ax.set_xlabel(r"model", fontsize=12)
-    ax.set_ylabel(r"$t_B$", fontsize=12)
-
-    ax.set_ylim([3,65])
-
-    ax.minorticks_on()
-    ax.grid(which='minor', color='black', linestyle=':')
-    ax.grid(which='major', color='black', linestyle=':')
+    if times is None:
+        times = find_times(lbol_read)
+    tb = times[1]
+    draw_times(ax, tb, r"$t_B$", [3, 65])
 
     if os.path.isdir(path_to_save):
         path = os.path.join(path_to_save,"tb.eps")
@@ -273,22 +344,48 @@ def plot_tb(lbol_read, fig=None, path_to_save="graphics"):
     return tb
 
 
-def show_pf_relation(mag_read, fig=None, m15 = np.arange(0.7, 1.85, 0.1), path_to_save="graphics"):
+def pf_relation(mag_read, days=15.):
+    """
+    Спад блеска за days дней и максимум блеска в полосе V
+    для всех моделей за один векторизованный проход
+    :param mag_read: ModelGrid или результат read_mag_reader
+    :return: dm15, minV, short - кривая короче t_peak + days
+    """
+    if not isinstance(mag_read, ModelGrid):
+        mag_read = ModelGrid.from_readers(mag_read=mag_read)
+    return mag_read.pf_relation(days)
+
+
+def synthetic_pf_relation(models, band='V', days=15., cache='use', data_dir='raw_data'):
+    """
+    Спад блеска за days дней и максимум блеска в произвольном фильтре
+    по синтетической фотометрии спектров .flx
+    :param band: встроенный фильтр ('B', 'V') или файл кривой пропускания
+    :return: dm15, m_peak, short - кривая короче t_peak + days
+    """
+    t, mag, offsets = grid_magnitudes(models, (band,), data_dir, cache)
+    t_peak, m_peak, dm15, short = peak_metrics(t, mag[:, 0], offsets, days)
+    return dm15, m_peak, short
+
+
+@timed('render')
+def show_pf_relation(mag_read, fig=None, m15 = PF_M15, path_to_save="graphics",
+                     relation=None, band='V'):
     """
     Построение соотношения Псковского-Филипсса
+    :param relation: готовые (dm15, m_peak, short), например из synthetic_pf_relation
+    :param band: фильтр для подписи оси
     """
+    plt = pyplot()
     if fig is None:
         fig = plt.figure()
     #fig.set_size_inches(6, 5, forward=True)
 
     ax = fig.gca()
 
-    [mag_read[name][0].show_mbol_lightcurve(mag_read[name][1], fig) for name in mag_read.keys()]
-    a = -20.883
-    b = 1.949
-    mV = a + b * m15
-    err = np.sqrt(0.417)
-    ax.fill_between(m15, mV - err, mV + err, alpha=0.2, color='black')
+    if relation is None:
+        relation = pf_relation(mag_read)
+    draw_pf(ax, *relation, band=band, m15=m15)
 
     if os.path.isdir(path_to_save):
         path = os.path.join(path_to_save,"PF.jpeg")
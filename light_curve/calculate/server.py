@@ -0,0 +1,276 @@
+import json
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from .bundle import grid_models
+from .grid import ModelGrid
+from .memo import fingerprint
+from .res import ResReader
+from .instrument import log
+
+
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+# число запомненных результатов для разных eps, days, tol
+SNAPSHOT_SIZE = 32
+
+
+def to_json(values):
+    """
+    Массив в список для JSON, nan -> None
+    """
+    values = np.asarray(values, dtype=float)
+    return [None if not np.isfinite(x) else float(x) for x in values]
+
+
+def from_json(values):
+    return np.array([np.nan if x is None else x for x in values], dtype=float)
+
+
+class Snapshot(object):
+    """
+    Загруженная сетка и посчитанные по ней величины. Не меняется
+    после создания, кроме кэшей times, pf и matches по параметрам:
+    общий LRU на SNAPSHOT_SIZE значений под блокировкой, так как
+    запросы обрабатываются в разных потоках
+    """
+    def __init__(self, grid, read=None, maxsize=SNAPSHOT_SIZE):
+        self.grid = grid
+        self.read = read
+        self.minB = grid.minB()
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.find_times(1e-5)
+        self.pf_relation(15.)
+
+    def cached(self, key, compute):
+        """
+        Значение по ключу (вид, параметр). Считается вне блокировки,
+        одновременные запросы с одним параметром могут посчитать его дважды
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        value = compute()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+    def find_times(self, eps):
+        return self.cached(('times', eps), lambda: self.grid.find_times(eps))
+
+    def pf_relation(self, days):
+        return self.cached(('pf', days), lambda: self.grid.pf_relation(days))
+
+    def match(self, tol):
+        return self.cached(('match', tol), lambda: self.read.match_grid(self.minB, tol))
+
+
+class GridState(object):
+    """
+    Сетка моделей в памяти сервера. Не чаще раза в interval секунд
+    проверяются отпечатки файлов; при изменении сетка собирается
+    заново, но файлы неизмененных моделей берутся из памяти (memo_map)
+    """
+    def __init__(self, path=os.path.join('data', 'raw_data'), salt=None, cache='use', interval=1.):
+        self.path = path
+        self.salt = salt
+        self.cache = cache
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.checked = 0.
+        self.reloads = 0
+        self.snapshot = None
+        self.refresh(force=True)
+
+    def sources(self, models):
+        files = [os.path.join(self.path, name + ext) for name in models for ext in ('.tt', '.lbol')]
+        return files + ([self.salt] if self.salt else [])
+
+    def refresh(self, force=False):
+        """
+        :return: актуальный Snapshot
+        """
+        if not force and time.monotonic() - self.checked < self.interval:
+            return self.snapshot
+        with self.lock:
+            if not force and time.monotonic() - self.checked < self.interval:
+                return self.snapshot
+            models = grid_models(self.path)
+            stamp = (tuple(models), fingerprint(*self.sources(models)))
+            if stamp != self.stamp:
+                grid = ModelGrid.load(models, self.cache, data_dir=os.path.abspath(self.path))
+                read = ResReader(self.salt) if self.salt else None
+                self.snapshot = Snapshot(grid, read)
+                self.stamp = stamp
+                self.reloads += 1
+                log.info(f'{len(grid)} models loaded from {self.path}')
+            self.checked = time.monotonic()
+            return self.snapshot
+
+    def status(self, params):
+        snapshot = self.refresh()
+        return {'models': len(snapshot.grid), 'reloads': self.reloads, 'data': self.path,
+                'salt': snapshot.read is not None}
+
+    def models(self, params):
+        return {'models': self.refresh().grid.names}
+
+    def times(self, params):
+        snapshot = self.refresh()
+        ta, tb, lbol_ta, lbol_tb = snapshot.find_times(float(params.get('eps', 1e-5)))
+        return {'models': snapshot.grid.names, 'ta': to_json(ta), 'tb': to_json(tb),
+                'lbol_ta': to_json(lbol_ta), 'lbol_tb': to_json(lbol_tb)}
+
+    def pf(self, params):
+        snapshot = self.refresh()
+        dm15, minV, short = snapshot.pf_relation(float(params.get('days', 15.)))
+        return {'models': snapshot.grid.names, 'dm15': to_json(dm15), 'minV': to_json(minV),
+                'short': [bool(x) for x in short]}
+
+    def min_b(self, params):
+        snapshot = self.refresh()
+        return {'models': snapshot.grid.names, 'minB': to_json(snapshot.minB)}
+
+    def match(self, params):
+        snapshot = self.refresh()
+        if snapshot.read is None:
+            raise ValueError('server started without salt data (--read)')
+        offsets, matched = snapshot.match(float(params.get('tol', 0.5)))
+        names = snapshot.grid.names
+        return {'objects': [str(name) for name in snapshot.read.names],
+                'models': [[names[k] for k in matched[offsets[i]:offsets[i + 1]]]
+                           for i in range(len(offsets) - 1)]}
+
+
+ROUTES = {
+    '/status': GridState.status,
+    '/models': GridState.models,
+    '/times': GridState.times,
+    '/pf': GridState.pf,
+    '/minB': GridState.min_b,
+    '/match': GridState.match,
+}
+
+
+class GridHandler(BaseHTTPRequestHandler):
+    """
+    GET запросы к GridState, ответ - JSON
+    """
+    state = None
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        params = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        route = ROUTES.get(url.path)
+        if route is None:
+            return self.reply(404, {'error': f'unknown query {url.path}, use one of {sorted(ROUTES)}'})
+        try:
+            body = route(self.state, params)
+        except ValueError as e:
+            return self.reply(400, {'error': str(e)})
+        except Exception as e:
+            # например, файл модели удален во время перезагрузки сетки
+            log.exception(f'query {self.path} failed')
+            return self.reply(500, {'error': f'{type(e).__name__}: {e}'})
+        self.reply(200, body)
+
+    def reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+
+def make_server(state, host=SERVER_HOST, port=SERVER_PORT):
+    """
+    HTTP сервер на localhost, запросы обрабатываются в отдельных потоках
+    :param port: 0 - любой свободный порт
+    """
+    handler = type('Handler', (GridHandler,), {'state': state})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(path=os.path.join('data', 'raw_data'), salt=None, cache='use', host=SERVER_HOST, port=SERVER_PORT,
+          interval=1.):
+    """
+    Запуск сервера до Ctrl-C
+    """
+    server = make_server(GridState(path, salt, cache, interval), host, port)
+    log.info(f'serving {path} on http://{host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class GridClient(object):
+    """
+    Клиент сервера сетки. Методы повторяют model_times,
+    model_pf_relation и model_minB: величины для models берутся
+    из ответа сервера по именам, nan для моделей, которых нет на сервере
+    """
+    def __init__(self, address=f'http://{SERVER_HOST}:{SERVER_PORT}', timeout=60.):
+        self.address = address.rstrip('/')
+        self.timeout = timeout
+
+    def query(self, path, **params):
+        url = f'{self.address}{path}'
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    @staticmethod
+    def select(body, models, *keys):
+        index = {name: i for i, name in enumerate(body['models'])}
+        rows = [index.get(name, -1) for name in models]
+        result = []
+        for key in keys:
+            values = np.r_[from_json(body[key]), np.nan]
+            result.append(values[rows])
+        return result
+
+    def models(self):
+        """
+        :return: {model: index}
+        """
+        return {name: i for i, name in enumerate(self.query('/models')['models'])}
+
+    def model_times(self, models, eps=1e-5, **kwargs):
+        body = self.query('/times', eps=eps)
+        return tuple(self.select(body, models, 'ta', 'tb', 'lbol_ta', 'lbol_tb'))
+
+    def model_pf_relation(self, models, days=15., **kwargs):
+        body = self.query('/pf', days=days)
+        body['short'] = [float(x) for x in body['short']]
+        dm15, minV, short = self.select(body, models, 'dm15', 'minV', 'short')
+        return dm15, minV, short != 0
+
+    def model_minB(self, models, **kwargs):
+        return self.select(self.query('/minB'), models, 'minB')[0]
+
+    def match(self, tol=0.5):
+        """
+        :return: {объект: [модели]}
+        """
+        body = self.query('/match', tol=tol)
+        return dict(zip(body['objects'], body['models']))
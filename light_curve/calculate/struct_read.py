@@ -0,0 +1,229 @@
+import os
+from abc import ABC, abstractmethod
+import numpy as np
+from .cache import CACHE_MODES, cache_path, store, drop_stale
+from .instrument import log, count, timed
+
+
+# индекс блоков: время (дни), смещение и размер блока в байтах
+INDEX_DTYPE = np.dtype([('time', 'f8'), ('offset', 'i8'), ('size', 'i8')])
+
+
+class BlockReader(ABC):
+    """
+    Потоковое чтение файлов структуры модели, записанных блоками
+    по моментам времени. При первом проходе строится индекс смещений
+    блоков в байтах, после чего любой момент читается без чтения
+    всего файла. Индекс хранится рядом с кэшем таблиц (.npy)
+    и действителен, пока файл не изменился
+    """
+    ext = ''
+    index_dtype = INDEX_DTYPE
+
+    def __init__(self, mname, data_dir='raw_data', cache='use', cache_dir=None):
+        """
+        :param cache: режим кэша индекса 'use', 'rebuild' или 'off'
+        :param cache_dir: директория кэша, по умолчанию CACHE_DIR
+        """
+        if cache not in CACHE_MODES:
+            raise ValueError(f'unknown cache mode {cache}, use one of {CACHE_MODES}')
+        self.mname = mname
+        self.fname = os.path.join('data', data_dir, mname + self.ext)
+        self.cache = cache
+        self.cache_dir = cache_dir
+        self._index = None
+
+    @abstractmethod
+    def block_time(self, line):
+        """
+        Время (в днях), если строка начинает новый блок, иначе None
+        """
+
+    @abstractmethod
+    def parse_block(self, lines):
+        """
+        Таблица по зонам для строк одного блока
+        """
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def index(self):
+        """
+        Индекс блоков (index_dtype), строится при первом обращении
+        """
+        if self._index is None:
+            self._index = self.load_index()
+        return self._index
+
+    @property
+    def offsets(self):
+        return self.index['offset']
+
+    @property
+    def times(self):
+        """
+        Время всех блоков, дни
+        """
+        return self.index['time']
+
+    def blocks(self, f):
+        """
+        Генератор блоков файла: смещение, время и строки блока.
+        В памяти хранится только текущий блок
+        """
+        offset = f.tell()
+        start, time, lines = None, None, []
+        line = f.readline()
+        while line:
+            t = self.block_time(line)
+            if t is not None:
+                if start is not None:
+                    yield start, time, lines
+                start, time, lines = offset, t, []
+            lines.append(line)
+            offset += len(line)
+            line = f.readline()
+        if start is not None:
+            yield start, time, lines
+
+    def index_row(self, offset, t, lines):
+        """
+        Строка индекса для блока
+        """
+        return t, offset, sum(len(line) for line in lines)
+
+    def epochs(self):
+        """
+        Генератор по моментам времени: (t, таблица по зонам).
+        Попутно строится индекс смещений блоков
+        """
+        rows = []
+        with open(self.fname, 'rb') as f:
+            for offset, t, lines in self.blocks(f):
+                rows.append(self.index_row(offset, t, lines))
+                yield t, self.parse_block(lines)
+        self._index = np.array(rows, dtype=self.index_dtype)
+
+    def __iter__(self):
+        return self.epochs()
+
+    def scan(self):
+        """
+        Индекс блоков без разбора таблиц: один проход по файлу
+        """
+        with open(self.fname, 'rb') as f:
+            rows = [self.index_row(offset, t, lines) for offset, t, lines in self.blocks(f)]
+            count('bytes_read', f.tell())
+        return np.array(rows, dtype=self.index_dtype)
+
+    def load_index(self):
+        """
+        Индекс из кэша или новый проход по файлу (scan)
+        """
+        if self.cache == 'off':
+            return self.scan()
+        path = cache_path(self.fname, self.cache_dir, index=self.ext)
+        if self.cache == 'use' and os.path.isfile(path):
+            try:
+                index = np.load(path)
+                if index.dtype == self.index_dtype:
+                    count('cache_hits')
+                    return index
+            except (OSError, ValueError):
+                pass
+        count('cache_misses')
+        index = self.scan()
+        try:
+            store(path, index)
+            drop_stale(self.fname, path, self.cache_dir, index=self.ext)
+        except OSError as e:
+            log.warning(f'cannot write index for {self.fname} with error {e}')
+        return index
+
+    def build_index(self):
+        """
+        Перестраиваем индекс смещений блоков без разбора таблиц
+        """
+        self._index = self.scan()
+
+    def read_block(self, i):
+        """
+        Строки блока i, читаем только его байты
+        """
+        offset, size = self.index['offset'][i], self.index['size'][i]
+        with open(self.fname, 'rb') as f:
+            f.seek(offset)
+            raw = f.read(size)
+        count('bytes_read', len(raw))
+        return raw.splitlines(keepends=True)
+
+    @timed('parse')
+    def epoch(self, i):
+        """
+        Таблица по зонам для момента с номером i
+        :return: t, table
+        """
+        lines = self.read_block(i)
+        return self.times[i], self.parse_block(lines)
+
+    def nearest(self, t):
+        """
+        Номер момента, ближайшего к t (в днях)
+        """
+        if not len(self.index):
+            raise ValueError(f'no blocks in {self.fname}')
+        return int(np.argmin(np.abs(self.times - t)))
+
+    def at_time(self, t):
+        """
+        Таблица по зонам для момента, ближайшего к t (например, ta или tb)
+        :return: t, table
+        """
+        return self.epoch(self.nearest(t))
+
+
+class SwdReader(BlockReader):
+    """
+    Файл .swd: в строках первой и последней зоны блока первый столбец -
+    время в днях, в остальных строках 0. Столбцы таблицы начиная
+    с номера зоны
+    """
+    ext = '.swd'
+
+    def block_time(self, line):
+        fields = line.split()
+        if len(fields) < 2 or fields[1] != b'1':
+            return None
+        return float(fields[0])
+
+    def parse_block(self, lines):
+        return np.array([line.split()[1:] for line in lines], dtype=float)
+
+
+class TauReader(BlockReader):
+    """
+    Файл .tau: блок начинается строкой 'PROPER T= <секунды>', затем
+    заголовок NZON с логарифмами частот и строки зон:
+    номер, R14, V8, T5 и оптические толщины на частотах
+    """
+    ext = '.tau'
+    marker = b'PROPER T='
+    day = 86400.
+
+    def block_time(self, line):
+        if not line.startswith(self.marker):
+            return None
+        return float(line[len(self.marker):]) / self.day
+
+    def parse_block(self, lines):
+        rows = [line.split() for line in lines[2:]]
+        return np.array([row for row in rows if row], dtype=float)
+
+    def lgfreq(self, i):
+        """
+        Логарифмы частот из заголовка блока i
+        """
+        header = self.read_block(i)[1].split()
+        return np.array(header[6:], dtype=float)
@@ -0,0 +1,125 @@
+import os
+import numpy as np
+from .times import find_ta_tb_batch
+from .instrument import log, timed
+
+
+TIMES_DTYPE = np.dtype([('eps', 'f8'), ('model', 'i4'), ('ta', 'f8'), ('tb', 'f8'),
+                        ('lbol_ta', 'f8'), ('lbol_tb', 'f8')])
+MATCH_DTYPE = np.dtype([('MB', 'f8'), ('alpha', 'f8'), ('beta', 'f8'), ('tol', 'f8'),
+                        ('object', 'i4'), ('matched', 'i4'), ('nearest', 'i4'), ('residual', 'f8')])
+
+
+def parse_values(values):
+    """
+    Значения параметра из командной строки: числа или отрезки
+    'start:stop:num' (равномерная сетка из num точек)
+    """
+    result = []
+    for value in values:
+        if ':' in str(value):
+            start, stop, num = str(value).split(':')
+            result.extend(np.linspace(float(start), float(stop), int(num)))
+        else:
+            result.append(float(value))
+    return np.array(result, dtype=float)
+
+
+@timed('reduce')
+def sweep_times(grid, eps_values, chunk=64):
+    """
+    ta и tb всех моделей для каждого значения eps. Сетка копируется
+    chunk раз, и все копии обрабатываются одним вызовом find_ta_tb_batch
+    :param grid: ModelGrid
+    :return: таблица TIMES_DTYPE, строка на пару (eps, модель)
+    """
+    eps_values = np.atleast_1d(np.asarray(eps_values, dtype=float))
+    n = len(grid)
+    total = len(grid.lbol_t)
+    table = np.zeros(len(eps_values) * n, dtype=TIMES_DTYPE)
+    for start in range(0, len(eps_values), chunk):
+        eps = eps_values[start:start + chunk]
+        k = len(eps)
+        offsets = np.r_[(grid.lbol_offsets[:-1] + total * np.arange(k)[:, None]).ravel(), k * total]
+        ta, tb, lbol_ta, lbol_tb = find_ta_tb_batch(np.tile(grid.lbol_t, k), np.tile(grid.lbol, k), offsets,
+                                                    np.tile(grid.mni, k), np.repeat(eps, n))
+        rows = table[start * n:(start + k) * n]
+        rows['eps'] = np.repeat(eps, n)
+        rows['model'] = np.tile(np.arange(n), k)
+        rows['ta'], rows['tb'], rows['lbol_ta'], rows['lbol_tb'] = ta, tb, lbol_ta, lbol_tb
+    return table
+
+
+@timed('match')
+def sweep_matches(x1, c, mag, MB, alpha, beta, tol, chunk=4096):
+    """
+    Для всех сочетаний MB, alpha, beta, tol и всех объектов SALT: число
+    моделей в коридоре +-tol вокруг уравнения стандартизации, ближайшая
+    модель и отклонение от нее. Модели сортируются по блеску один раз,
+    сочетания обрабатываются блоками по chunk одним бинарным поиском
+    :param mag: максимум блеска моделей в полосе B
+    :return: таблица MATCH_DTYPE, строка на пару (сочетание, объект)
+    """
+    x1 = np.asarray(x1, dtype=float)
+    c = np.asarray(c, dtype=float)
+    mag = np.asarray(mag, dtype=float)
+    grids = np.meshgrid(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in (MB, alpha, beta, tol)),
+                        indexing='ij')
+    MB, alpha, beta, tol = (g.ravel() for g in grids)
+
+    valid = np.flatnonzero(np.isfinite(mag))
+    order = valid[np.argsort(mag[valid], kind='stable')]
+    sorted_mag = mag[order]
+    s = len(x1)
+    table = np.zeros(len(MB) * s, dtype=MATCH_DTYPE)
+
+    for start in range(0, len(MB), chunk):
+        part = slice(start, start + chunk)
+        k = len(MB[part])
+        z = MB[part, None] - alpha[part, None] * x1 + beta[part, None] * c
+        width = np.repeat(tol[part], s)
+        z = z.ravel()
+        lo = np.searchsorted(sorted_mag, z - width, side='left')
+        hi = np.searchsorted(sorted_mag, z + width, side='right')
+
+        rows = table[start * s:(start + k) * s]
+        for name, values in zip(('MB', 'alpha', 'beta', 'tol'), (MB, alpha, beta, tol)):
+            rows[name] = np.repeat(values[part], s)
+        rows['object'] = np.tile(np.arange(s), k)
+        rows['matched'] = np.maximum(hi - lo, 0)
+        if len(sorted_mag) == 0:
+            rows['nearest'] = -1
+            rows['residual'] = np.nan
+            continue
+        pos = np.searchsorted(sorted_mag, z)
+        left = np.clip(pos - 1, 0, len(sorted_mag) - 1)
+        right = np.clip(pos, 0, len(sorted_mag) - 1)
+        best = np.where(np.abs(sorted_mag[left] - z) <= np.abs(sorted_mag[right] - z), left, right)
+        rows['nearest'] = order[best]
+        rows['residual'] = sorted_mag[best] - z
+    return table
+
+
+def run_sweep(grid, read=None, eps=(1e-5,), MB=None, alpha=None, beta=None, tol=(0.5,), out=None):
+    """
+    Перебор параметров по всей сетке: eps для ta, tb и, если задан
+    read, MB, alpha, beta, tol уравнения стандартизации (по умолчанию
+    значения из read). Файлы моделей читаются один раз
+    :param grid: ModelGrid
+    :param out: .npz файл для результатов
+    :return: {'models', 'times', 'objects', 'matches'}
+    """
+    result = {'models': np.array(grid.names), 'times': sweep_times(grid, eps)}
+    if read is not None:
+        MB = [read.MB] if MB is None else MB
+        alpha = [read.alpha] if alpha is None else alpha
+        beta = [read.beta] if beta is None else beta
+        result['objects'] = np.array(read.names)
+        result['matches'] = sweep_matches(read.x1, read.color, grid.minB(), MB, alpha, beta, tol)
+    if out:
+        out_dir = os.path.dirname(out)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        np.savez(out, **result)
+        log.info(f"{len(result['times'])} time rows and {len(result.get('matches', ()))} match rows saved to {out}")
+    return result
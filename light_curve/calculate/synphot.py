@@ -0,0 +1,184 @@
+import hashlib
+import os
+import numpy as np
+from .cache import CACHE_MODES, cache_path, drop_stale, store
+from . import cache as cache_module
+from .flx_read import FlxReader
+from .instrument import log, timed
+
+
+# кривые пропускания Бесселя (Bessell 1990): длина волны в ангстремах, пропускание
+BESSELL = {
+    'B': np.array([
+        [3600, 0.000], [3700, 0.030], [3800, 0.134], [3900, 0.567], [4000, 0.920],
+        [4100, 0.978], [4200, 1.000], [4300, 0.978], [4400, 0.935], [4500, 0.853],
+        [4600, 0.740], [4700, 0.640], [4800, 0.536], [4900, 0.424], [5000, 0.325],
+        [5100, 0.235], [5200, 0.150], [5300, 0.095], [5400, 0.043], [5500, 0.009],
+        [5600, 0.000]]),
+    'V': np.array([
+        [4700, 0.000], [4800, 0.030], [4900, 0.163], [5000, 0.458], [5100, 0.780],
+        [5200, 0.967], [5300, 1.000], [5400, 0.973], [5500, 0.898], [5600, 0.792],
+        [5700, 0.684], [5800, 0.574], [5900, 0.461], [6000, 0.359], [6100, 0.270],
+        [6200, 0.197], [6300, 0.135], [6400, 0.081], [6500, 0.045], [6600, 0.025],
+        [6700, 0.017], [6800, 0.013], [6900, 0.009], [7000, 0.000]]),
+}
+
+# поток .flx дан в относительных единицах, нуль-пункты встроенных
+# фильтров подобраны по столбцам MB и MV .tt файлов сетки
+ZERO_POINTS = {'B': -17.85, 'V': -17.33}
+
+
+def load_filter(fname):
+    """
+    Кривая пропускания из текстового файла: два столбца,
+    длина волны в ангстремах и пропускание
+    """
+    curve = np.loadtxt(fname, usecols=(0, 1), dtype=float, ndmin=2)
+    return curve[np.argsort(curve[:, 0])]
+
+
+def get_filter(band):
+    """
+    Встроенный фильтр по имени ('B', 'V') или фильтр из файла
+    :return: кривая пропускания, нуль-пункт
+    """
+    if band in BESSELL:
+        return BESSELL[band], ZERO_POINTS[band]
+    if os.path.isfile(band):
+        return load_filter(band), 0.
+    raise ValueError(f'unknown filter {band}, use one of {tuple(BESSELL)} or a file')
+
+
+def trapz(y, x):
+    """
+    Интеграл методом трапеций (np.trapz есть не во всех версиях numpy)
+    """
+    return 0.5 * np.sum((y[1:] + y[:-1]) * np.diff(x))
+
+
+def filter_weights(waves, curves, step=1.):
+    """
+    Веса для свертки потока с кривыми пропускания. Поток линейно
+    интерполируется по длине волны и усредняется с весом T / lambda
+    (средний F_nu при счете фотонов), поэтому свертка сводится
+    к умножению потока на матрицу весов
+    :param waves: длины волн столбцов потока
+    :param curves: кривые пропускания
+    :return: матрица (длины волн x фильтры)
+    """
+    waves = np.asarray(waves, dtype=float)
+    order = np.argsort(waves)
+    sorted_waves = waves[order]
+    weights = np.zeros((len(waves), len(curves)))
+    for j, curve in enumerate(curves):
+        lam = np.arange(curve[0, 0], curve[-1, 0] + step, step)
+        kernel = np.interp(lam, curve[:, 0], curve[:, 1], left=0, right=0) / lam
+        kernel /= trapz(kernel, lam)
+        # интеграл от линейной интерполяции потока - линейная функция потока:
+        # вес трапеции в точке lam делится между соседними длинами волн
+        # (за пределами сетки поток постоянный, как в np.interp)
+        dlam = np.diff(lam)
+        quad = kernel * 0.5 * (np.r_[dlam, 0] + np.r_[0, dlam])
+        x = np.clip(lam, sorted_waves[0], sorted_waves[-1])
+        i = np.clip(np.searchsorted(sorted_waves, x, side='right') - 1, 0, max(len(waves) - 2, 0))
+        if len(waves) > 1:
+            frac = (x - sorted_waves[i]) / (sorted_waves[i + 1] - sorted_waves[i])
+        else:
+            frac = np.zeros(len(lam))
+        column = np.bincount(i, quad * (1 - frac), minlength=len(waves))
+        column += np.bincount(np.minimum(i + 1, len(waves) - 1), quad * frac, minlength=len(waves))
+        weights[order, j] = column
+    return weights
+
+
+class SyntheticPhotometry(object):
+    """
+    Синтетическая фотометрия по спектрам .flx файлов в наборе фильтров.
+    Веса считаются один раз для сетки длин волн, потоки в фильтрах
+    хранятся в кэше отдельно для каждого набора фильтров
+    """
+    def __init__(self, bands=('B', 'V')):
+        self.bands = tuple(bands)
+        curves, zero_points = zip(*(get_filter(band) for band in self.bands))
+        self.curves = list(curves)
+        self.zero_points = np.array(zero_points)
+        self.key = hashlib.sha1(b''.join(np.ascontiguousarray(c).tobytes() for c in self.curves)).hexdigest()[:16]
+        self._weights = {}
+
+    def weights(self, waves):
+        """
+        Матрица весов для сетки длин волн waves
+        """
+        key = waves.tobytes()
+        if key not in self._weights:
+            self._weights[key] = filter_weights(waves, self.curves)
+        return self._weights[key]
+
+    @timed('reduce')
+    def band_flux(self, flx):
+        """
+        Потоки в фильтрах для всех моментов модели. Если фильтру
+        нужны столбцы за пределами nfrus момента, поток - nan
+        :return: таблица (моменты x (время, фильтры))
+        """
+        ncol = flx.ncol
+        weights = self.weights(flx.waves[:ncol])
+        parts = [record['flux'][:, :ncol] @ weights for record in flx.records]
+        flux = np.concatenate(parts) if parts else np.zeros((0, len(self.bands)))
+        used = np.array([np.flatnonzero(weights[:, j]).max(initial=-1) + 1 for j in range(weights.shape[1])])
+        flux[flx.nfrus[:, None] < used] = np.nan
+        return np.column_stack([flx.time, flux])
+
+    def magnitudes(self, mname, data_dir='raw_data', cache='use'):
+        """
+        Звездные величины модели в фильтрах
+        :param cache: режим кэша 'use', 'rebuild' или 'off'
+        :return: time, mag (моменты x фильтры)
+        """
+        if cache not in CACHE_MODES:
+            raise ValueError(f'unknown cache mode {cache}, use one of {CACHE_MODES}')
+        fname = os.path.join('data', data_dir, mname + '.flx')
+        table = None
+        if cache != 'off':
+            path = cache_path(fname, cache_module.CACHE_DIR, filters=self.key)
+            if cache == 'use' and os.path.isfile(path):
+                try:
+                    table = np.load(path, mmap_mode='r')
+                except (OSError, ValueError):
+                    pass
+        if table is None:
+            table = self.band_flux(FlxReader(mname, data_dir))
+            if cache != 'off':
+                try:
+                    store(path, table)
+                    drop_stale(fname, path, cache_module.CACHE_DIR, filters=self.key)
+                except OSError as e:
+                    log.warning(f'cannot write cache for {fname} with error {e}')
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mag = -2.5 * np.log10(table[:, 1:]) + self.zero_points
+        mag[~np.isfinite(mag)] = np.nan
+        return table[:, 0], mag
+
+
+def grid_magnitudes(models, bands=('B', 'V'), data_dir='raw_data', cache='use'):
+    """
+    Синтетические кривые блеска всех моделей, склеенные в один массив.
+    Модель без .flx файла получает одну точку без данных (nan)
+    :return: t, mag (отсчеты x фильтры), offsets
+    """
+    phot = SyntheticPhotometry(bands)
+    curves = []
+    for name in models:
+        try:
+            curves.append(phot.magnitudes(name, data_dir, cache))
+        except OSError:
+            log.warning(f'There is no data for {name}.flx')
+            curves.append((np.zeros(1), np.full((1, len(phot.bands)), np.nan)))
+    offsets = np.zeros(len(curves) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t, _ in curves], out=offsets[1:])
+    if not curves:
+        return np.zeros(0), np.zeros((0, len(phot.bands))), offsets
+    t = np.concatenate([t for t, _ in curves])
+    mag = np.concatenate([m for _, m in curves])
+    return t, mag, offsets
@@ -0,0 +1,84 @@
+import numpy as np
+from .parameters import T_Ni, T_Co, C_Co, C_Ni
+from .instrument import timed
+
+
+def model_mni(mname):
+    """
+    Масса никеля в массах Солнца, закодированная в имени
+    модели (m020209mh -> 0.2)
+    """
+    return int(mname[2]) * 0.1
+
+
+def deposition_lbol(tl, Mni):
+    """
+    Логарифм светимости депозиции гамма-квантов от распада Ni и Co
+    """
+    return np.log10(Mni * (C_Ni * np.exp(-tl / T_Ni) + C_Co * np.exp(-tl / T_Co)))
+
+
+def concat_curves(curves):
+    """
+    Склеиваем кривые блеска разной длины в общий массив
+    :param curves: список пар (tl, lbol)
+    :return: tl, lbol, offsets
+    """
+    lengths = [len(tl) for tl, _ in curves]
+    offsets = np.zeros(len(curves) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    if not curves:
+        return np.zeros(0), np.zeros(0), offsets
+    tl = np.concatenate([np.asarray(tl, dtype=float) for tl, _ in curves])
+    lbol = np.concatenate([np.asarray(lbol, dtype=float) for _, lbol in curves])
+    return tl, lbol, offsets
+
+
+def crossing(tl, lbol, d, i, j):
+    """
+    Линейная интерполяция точки, где d меняет знак между i и j
+    """
+    frac = d[i] / (d[i] - d[j])
+    return tl[i] + frac * (tl[j] - tl[i]), lbol[i] + frac * (lbol[j] - lbol[i])
+
+
+@timed('reduce')
+def find_ta_tb_batch(tl, lbol, offsets, Mni, eps=1e-5):
+    """
+    Находим времена ta и tb сразу для всех моделей. Кривые блеска
+    хранятся подряд в tl, lbol, модель k занимает offsets[k]:offsets[k+1].
+    Точки пересечения с кривой депозиции интерполируются между
+    соседними отсчетами
+    :param Mni: массы никеля моделей
+    :param eps: допуск, одно значение или свое для каждой кривой
+    :return: ta, tb, lbol_ta, lbol_tb (нули, если пересечения нет)
+    """
+    offsets = np.asarray(offsets)
+    n = len(offsets) - 1
+    seg = np.repeat(np.arange(n), np.diff(offsets))
+    eps = np.asarray(eps, dtype=float)
+    if eps.ndim:
+        eps = eps[seg]
+    d = deposition_lbol(tl, np.asarray(Mni, dtype=float)[seg]) - lbol - eps
+
+    ta, tb = np.zeros(n), np.zeros(n)
+    lbol_ta, lbol_tb = np.zeros(n), np.zeros(n)
+
+    idx = np.flatnonzero(d < 0)
+    if idx.size == 0:
+        return ta, tb, lbol_ta, lbol_tb
+
+    new_seg = np.r_[True, seg[idx[1:]] != seg[idx[:-1]]]
+    first = idx[new_seg]
+    last = idx[np.r_[new_seg[1:], True]]
+    found = seg[first]
+
+    ta[found], lbol_ta[found] = tl[first], lbol[first]
+    tb[found], lbol_tb[found] = tl[last], lbol[last]
+
+    inner = first > offsets[found]
+    ta[found[inner]], lbol_ta[found[inner]] = crossing(tl, lbol, d, first[inner] - 1, first[inner])
+    inner = last + 1 < offsets[found + 1]
+    tb[found[inner]], lbol_tb[found[inner]] = crossing(tl, lbol, d, last[inner], last[inner] + 1)
+
+    return ta, tb, lbol_ta, lbol_tb
@@ -1,61 +1,133 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import os
+from .cache import cached_loadtxt
+from .photometry import peak_metrics
+from .instrument import log
+from .render import pyplot
+from . import archive
+
+
+def find_header(fname, first='time'):
+    """
+    Ищем строку заголовка таблицы ('time Tbb rbb ...'), читая
+    файл построчно до первого совпадения
+    :return: номер строки заголовка, имена столбцов
+    """
+    with archive.open_text(fname) as f:
+        for i, line in enumerate(f):
+            names = line.split()
+            if names and names[0] == first:
+                return i, names
+    raise OSError(f'no table header in {fname}')
 
 
 class MagReader(object):
-    def __init__(self, mname, data_dir = 'raw_data'):
+    usecols = ('time', 'MB', 'MV')
+
+    def __init__(self, mname, data_dir = 'raw_data', cache='use', cache_dir=None):
         self.mname = mname
+        self.cache = cache
+        self.cache_dir = cache_dir
+        self._raw_data = None
+        self._columns = {}
         path = os.path.join('data', data_dir)
-        print(path)
-        if os.path.isdir(path):
+        if archive.isdir(path):
             try:
                 self.fname = os.path.join(path, mname+".tt")
                 self.process_tt_file()
             except OSError:
-                print(f'There is no data for {mname}.tt')
+                log.warning(f'There is no data for {mname}.tt')
         else:
-            print("You have no data directory")
+            log.warning(f"You have no data directory {path}")
 
     def process_tt_file(self):
         """
         Считываем .tt файл для получения звездных величин
         в различных фильтрах
         """
-        print(f"Reading tt file for run {self.mname}")
-        raw_data = np.loadtxt(self.fname, skiprows=87, dtype=float)
-        print(f"{self.fname} found and read\n")
-
-        self.raw_data = raw_data
+        log.debug(f"Reading tt file for run {self.mname}")
+        self.header, self.names = find_header(self.fname)
+        usecols = [self.names.index(name) for name in self.usecols]
+        raw_data = cached_loadtxt(self.fname, self.cache, self.cache_dir, skiprows=self.header + 1, usecols=usecols,
+                                  dtype=float)
+        log.debug(f"{self.fname} found and read")
 
         self.tl = raw_data[:, 0]
-        self.MV = raw_data[:, 9]
-        self.MB = raw_data[:, 8]
-        self.minV = min(self.MV)
-        self.minB = min(self.MB)
+        self.MB = raw_data[:, 1]
+        self.MV = raw_data[:, 2]
+        self.process_magnitudes()
 
-        stpmin = np.argmin(self.MV)
-        i15 = stpmin
-        while self.tl[i15] <= self.tl[stpmin] + 15:
-            i15 += 1
+    @classmethod
+    def from_table(cls, mname, names, table):
+        """
+        Читатель поверх уже разобранной таблицы .tt
+        (например, из пакета всей сетки моделей)
+        """
+        self = cls.__new__(cls)
+        self.mname = mname
+        self.cache = 'off'
+        self.cache_dir = None
+        self.fname = None
+        self.header = None
+        self.names = list(names)
+        self._raw_data = table
+        self._columns = {}
+        self.tl, self.MB, self.MV = (table[:, self.names.index(name)] for name in self.usecols)
+        self.process_magnitudes()
+        return self
 
-        self.dm15 = abs(self.minV - self.MV[i15])
+    def process_magnitudes(self):
+        """
+        Максимум блеска в полосах B и V и спад блеска за 15 дней
+        """
+        offsets = np.array([0, len(self.tl)])
+        t_peak, minV, dm15, short = peak_metrics(self.tl, self.MV, offsets)
+        self.minV = minV[0]
+        self.minB = np.min(self.MB)
+        self.dm15 = dm15[0]
+        self.short = short[0]
+        if self.short:
+            log.debug(f'light curve of {self.mname} is shorter than 15 days after maximum, dm15 is unknown')
+
+    @property
+    def raw_data(self):
+        """
+        Полная таблица .tt файла, читается при первом обращении
+        """
+        if self._raw_data is None:
+            self._raw_data = cached_loadtxt(self.fname, self.cache, self.cache_dir, skiprows=self.header + 1,
+                                            dtype=float)
+        return self._raw_data
+
+    def column(self, name):
+        """
+        Столбец таблицы по имени из заголовка (Tbb, Teff, MU, ...),
+        читается отдельно при первом обращении
+        """
+        if name not in self._columns:
+            if self._raw_data is not None:
+                self._columns[name] = self._raw_data[:, self.names.index(name)]
+            else:
+                self._columns[name] = cached_loadtxt(self.fname, self.cache, self.cache_dir, skiprows=self.header + 1,
+                                                     usecols=self.names.index(name), dtype=float)
+        return self._columns[name]
 
     def show_mbol_lightcurve(self, num, fig=None, m15=np.arange(0.7, 1.85, 0.1)):
         """
         Рисуем кривую блеска для звездных величин
         """
+        plt = pyplot()
         if fig is None:
             fig = plt.figure()
 
         ax = fig.gca()
 
-        ax.scatter(self.dm15, self.minV, color='dimgray', marker=f'.')
+        ax.scatter(self.dm15, self.minV, color='dimgray', marker='.')
 
         ax.minorticks_on()
         ax.grid(which='minor', color='black', linestyle=':')
         ax.grid(which='major', color='black', linestyle=':')
-        print(f"for {num} model is {self.mname}")
+        log.info(f"for {num} model is {self.mname}")
         ax.set_xlim([min(m15), max(m15)])
         ax.set_ylim([-15, -22])
 
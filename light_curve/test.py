@@ -1,5 +1,37 @@
 from calculate.res import *
+from calculate.cache import cached_loadtxt
+from calculate.bundle import GridBundle, pack_grid, model_params, grid_models
+from calculate.struct_read import BlockReader, SwdReader, TauReader
+from calculate.flx_read import FlxReader
+from calculate.synphot import SyntheticPhotometry, filter_weights, trapz
+from calculate.prefetch import prefetch_map
+from calculate.grid import ModelGrid, model_times
+from calculate.memo import Memo, MEMO
+from calculate.sweep import sweep_times, sweep_matches, parse_values
+from calculate.render import grid_figures, render_all
+from calculate.manifest import GridManifest
+from calculate.match import match_catalogue
+from calculate.montecarlo import stand_probability, match_probability
+from calculate.photometry import peak_metrics, decline_rates
+from calculate.times import deposition_lbol, concat_curves, find_ta_tb_batch
+from calculate.instrument import STATS, timed, profile, setup_log, log
+from calculate import archive
+from calculate.emulator import Emulator
+from calculate.bench import parse_importtime
+from calculate.hydro_read import HydroReader
+from calculate.server import GridState, GridClient, make_server
 import unittest
+import tempfile
+import subprocess
+import sys
+import tarfile
+import zipfile
+import json
+import logging
+import urllib.error
+import math
+import threading
+import time
 import os
 
 class SaltTest(unittest.TestCase):
@@ -33,5 +65,801 @@ class SaltTest(unittest.TestCase):
 		self.assertTrue(y2[1]==True, 'salt не сходится')
 		print('salt сходится')
 
+	def test_plain_types(self):
+		models = self.data.find_stand_data(self.dataMag)
+		p = self.data.stand_probability(self.dataMag, 100, seed=1)
+		self.assertEqual({type(k) for k in list(models) + list(p)}, {str}, "Имена моделей не str")
+		self.assertEqual({type(v) for v in models.values()}, {int}, "Номера моделей не int")
+		self.assertEqual({type(v) for v in p.values()}, {float}, "Вероятности не float")
+
+class CacheTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.fname = os.path.join(self.tmp.name, 'm010005mh.lbol')
+		with open(self.fname, 'w') as f:
+			f.write('time L_bol\n1.0 2.0\n3.0 4.0\n')
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_cache_hit(self):
+		first = cached_loadtxt(self.fname, cache_dir=self.tmp.name, skiprows=1)
+		second = cached_loadtxt(self.fname, cache_dir=self.tmp.name, skiprows=1)
+		self.assertIsInstance(second, np.memmap, "Кэш не используется")
+		self.assertTrue(np.array_equal(first, second), "Неправильно считано из кэша")
+
+	def test_cache_invalidation(self):
+		cached_loadtxt(self.fname, cache_dir=self.tmp.name, skiprows=1)
+		with open(self.fname, 'a') as f:
+			f.write('5.0 6.0\n')
+		data = cached_loadtxt(self.fname, cache_dir=self.tmp.name, skiprows=1)
+		self.assertEqual(data.shape, (3, 2), "Кэш не сброшен после изменения файла")
+		entries = [f for f in os.listdir(self.tmp.name) if f.endswith('.npy')]
+		self.assertEqual(len(entries), 1, "Устаревшая запись кэша не удалена")
+
+	def test_cache_columns(self):
+		full = cached_loadtxt(self.fname, cache_dir=self.tmp.name, skiprows=1)
+		column = cached_loadtxt(self.fname, cache_dir=self.tmp.name, skiprows=1, usecols=1)
+		entries = [f for f in os.listdir(self.tmp.name) if f.endswith('.npy')]
+		self.assertEqual(len(entries), 2, "Запись полной таблицы вытеснена подмножеством столбцов")
+		STATS.reset()
+		self.assertTrue(np.array_equal(cached_loadtxt(self.fname, cache_dir=self.tmp.name, skiprows=1), full), "Неправильно считано из кэша")
+		self.assertTrue(np.array_equal(cached_loadtxt(self.fname, cache_dir=self.tmp.name, skiprows=1, usecols=1), column), "Неправильно считано из кэша")
+		self.assertEqual(STATS.summary()['counters'].get('cache_hits'), 2, "Кэш не используется")
+
+	def test_cache_dir_processes(self):
+		models = os.path.join(self.tmp.name, 'models')
+		os.mkdir(models)
+		write_model(models, 'm010305mh', 30)
+		write_model(models, 'm020209mh', 40)
+		cache_dir = os.path.join(self.tmp.name, 'cache')
+		read_mag_reader({'m010305mh': 0, 'm020209mh': 1}, 'use', jobs=2, data_dir=models, cache_dir=cache_dir)
+		self.assertEqual(len(os.listdir(cache_dir)), 2, "Процессы пула пишут кэш не в cache_dir")
+
+
+class TimesTest(unittest.TestCase):
+	def setUp(self):
+		tl = np.arange(1.0, 60.0, 2.0)
+		dep = deposition_lbol(tl, 0.5)
+		crossing = dep - 0.01 * (tl - 10) * (tl - 30)
+		below = dep - 1.0
+		self.tl, self.lbol, self.offsets = concat_curves([(tl, crossing), (tl[:10], below[:10])])
+
+	def test_batch(self):
+		ta, tb, lbol_ta, lbol_tb = find_ta_tb_batch(self.tl, self.lbol, self.offsets, [0.5, 0.5])
+		self.assertAlmostEqual(ta[0], 10, delta=0.5, msg="Неправильное время ta")
+		self.assertAlmostEqual(tb[0], 30, delta=0.5, msg="Неправильное время tb")
+		self.assertTrue(ta[0] < 11 and tb[0] > 29, "Время не интерполируется")
+		self.assertEqual((ta[1], tb[1], lbol_ta[1], lbol_tb[1]), (0, 0, 0, 0), "Найдено несуществующее пересечение")
+
+
+class MagReaderTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		names = ['time', 'Tbb', 'rbb', 'Teff', 'Rlast_sc', 'R(tau2/3)', 'Mbol', 'MU', 'MB', 'MV', 'MI', 'MR', 'Mbolavg', 'gdepos']
+		tl = np.arange(0.0, 40.0)
+		table = np.zeros((len(tl), len(names)))
+		table[:, 0] = tl
+		table[:, 3] = 1000 + tl
+		table[:, 8] = -19 + 0.01 * (tl - 10) ** 2
+		table[:, 9] = -18 + 0.01 * (tl - 12) ** 2
+		with open(os.path.join(self.tmp.name, 'm010005mh.tt'), 'w') as f:
+			f.write('preamble of another STELLA version\n' * 3)
+			f.write('  ' + '  '.join(names) + '\n')
+			np.savetxt(f, table)
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_columns(self):
+		mag = MagReader('m010005mh', data_dir=self.tmp.name, cache='off')
+		self.assertEqual(mag.header, 3, "Неправильно найден заголовок")
+		self.assertEqual((mag.minB, mag.minV), (-19, -18), "Неправильно считано")
+		self.assertIsNone(mag._raw_data, "Вся таблица прочитана без обращения")
+		self.assertTrue(np.array_equal(mag.column('Teff'), 1000 + mag.tl), "Неправильно считан столбец")
+
+
+def write_model(path, mname, rows=40):
+	tl = np.arange(0.0, rows)
+	with open(os.path.join(path, mname + '.tt'), 'w') as f:
+		f.write('  time  MB  MV\n')
+		np.savetxt(f, np.c_[tl, -19 + 0.01 * (tl - 10) ** 2, -18 + 0.01 * (tl - 12) ** 2])
+	with open(os.path.join(path, mname + '.lbol'), 'w') as f:
+		f.write('  time  L_ubvri  L_bol\n')
+		np.savetxt(f, np.c_[tl, tl, 42 - 0.01 * tl])
+
+
+class BundleTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		write_model(self.tmp.name, 'm020209mh', 40)
+		write_model(self.tmp.name, 'm010305mh', 30)
+		self.out = os.path.join(self.tmp.name, 'grid.npz')
+		pack_grid(self.tmp.name, self.out, cache='off')
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_bundle(self):
+		bundle = GridBundle(self.out)
+		self.assertEqual(sorted(bundle.models()), ['m010305mh', 'm020209mh'], "Неправильный список моделей")
+		self.assertEqual(tuple(bundle.params[bundle.index['m020209mh']]), model_params('m020209mh'), "Неправильные параметры")
+		mag = bundle.mag_reader('m010305mh')
+		lbol = bundle.lbol_reader('m010305mh')
+		self.assertEqual((len(mag.tl), mag.minB), (30, -19), "Неправильно считано из пакета")
+		self.assertTrue(np.array_equal(lbol.lbol, 42 - 0.01 * np.arange(30.0)), "Неправильно считано из пакета")
+
+	def test_missing(self):
+		bundle = GridBundle(self.out)
+		with self.assertRaisesRegex(KeyError, 'm030101mh.*grid.npz'):
+			ModelGrid.load({'m030101mh': 0}, bundle=bundle)
+		with self.assertRaisesRegex(OSError, r'\.flx'):
+			bundle.require('.flx')
+		bundle.require('.tt')
+
+	def test_lbol_only(self):
+		open(os.path.join(self.tmp.name, 'm020209mh.tt'), 'w').close()
+		out = os.path.join(self.tmp.name, 'lbol.npz')
+		with self.assertLogs('light_curve', 'WARNING'):
+			names = pack_grid(self.tmp.name, out, cache='off')
+		self.assertEqual(names, ['m010305mh'], "Модель без таблицы .tt не пропущена")
+		os.remove(os.path.join(self.tmp.name, 'm020209mh.tt'))
+		os.remove(os.path.join(self.tmp.name, 'm010305mh.tt'))
+		with self.assertLogs('light_curve', 'WARNING'), self.assertRaisesRegex(OSError, 'no models'):
+			pack_grid(self.tmp.name, out, cache='off')
+
+	def test_cli_error(self):
+		code = 'import sys, light_curve; sys.argv = ["light", "--bundle", sys.argv[1], "--pf", "--band=B"]; ' \
+			   'light_curve.parsing()'
+		proc = subprocess.run([sys.executable, '-c', code, self.out], capture_output=True, text=True,
+							  cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+		self.assertEqual(proc.returncode, 1, "Неправильный код выхода")
+		self.assertIn('.flx', proc.stderr, "Нет сообщения об ошибке")
+		self.assertNotIn('Traceback', proc.stderr, "Ошибка выведена трассировкой")
+
+
+class ArchiveTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.models = os.path.join(self.tmp.name, 'models')
+		os.makedirs(self.models)
+		write_model(self.models, 'm010305mh', 30)
+		write_model(self.models, 'm020209mh', 40)
+		for mname in ('m010305mh', 'm020209mh'):
+			os.remove(os.path.join(self.models, mname + '.tt'))
+		self.zip = os.path.join(self.tmp.name, 'models.zip')
+		with zipfile.ZipFile(self.zip, 'w', zipfile.ZIP_DEFLATED) as zf:
+			for name in os.listdir(self.models):
+				zf.write(os.path.join(self.models, name), os.path.join('models', name))
+		self.tar = os.path.join(self.tmp.name, 'models.tar.gz')
+		with tarfile.open(self.tar, 'w:gz') as tf:
+			tf.add(self.models, 'models')
+		self.plain = os.path.join(self.tmp.name, 'models.tar')
+		with tarfile.open(self.plain, 'w') as tf:
+			tf.add(self.models, 'models')
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_readers(self):
+		expected = LbolReader('m020209mh', self.models, 'off')
+		for path in (self.zip, self.tar, self.plain):
+			self.assertEqual(sorted(grid_models(path)), ['m010305mh', 'm020209mh'], "Неправильно найдены модели")
+			read = LbolReader('m020209mh', path, 'off')
+			self.assertTrue(np.array_equal(read.lbol, expected.lbol), "Неправильно прочитан файл архива")
+			grid = ModelGrid.load(grid_models(path), 'off', data_dir=path, threads=4)
+			self.assertEqual(list(np.diff(grid.lbol_offsets)), [30, 40], "Неправильно прочитана сетка")
+		self.assertFalse(archive.open_archive(self.plain).compressed, "Несжатый tar читается целиком")
+		with archive.open_text(os.path.join(self.plain, 'm020209mh.lbol')) as f:
+			self.assertEqual(f.readline().split(), ['time', 'L_ubvri', 'L_bol'], "Неправильно прочитан файл tar")
+			self.assertEqual(len(f.readlines()), 40, "Неправильно прочитан файл tar")
+
+	def test_lbol_only(self):
+		for path in (self.models, self.zip, self.tar):
+			with self.assertLogs('light_curve', 'WARNING') as logs:
+				ModelGrid.load(grid_models(path), 'off', data_dir=path)
+				log.warning('done')
+			self.assertEqual(logs.output, ['WARNING:light_curve:done'], "Предупреждение об отсутствующих .tt")
+		with self.assertLogs('light_curve', 'WARNING') as logs:
+			ModelGrid.load({'m030101mh': 0}, 'off', data_dir=self.zip)
+		self.assertEqual(len(logs.output), 1, "Нет предупреждения об отсутствующем .lbol")
+
+	def test_cache(self):
+		fname = os.path.join(self.zip, 'm010305mh.lbol')
+		cache_dir = os.path.join(self.tmp.name, 'cache')
+		data = cached_loadtxt(fname, 'use', cache_dir, skiprows=1)
+		self.assertEqual(len(os.listdir(cache_dir)), 1, "Кэш файла архива не записан")
+		self.assertTrue(np.array_equal(cached_loadtxt(fname, 'use', cache_dir, skiprows=1), data), "Неправильный кэш")
+		self.assertFalse(archive.isfile(os.path.join(self.zip, 'm030101mh.lbol')), "Найден несуществующий файл")
+
+	def test_reopen(self):
+		old = archive.open_archive(self.zip)
+		with zipfile.ZipFile(self.zip, 'a') as zf:
+			zf.writestr('models/m030101mh.lbol', 'time L_ubvri L_bol\n1 2 3\n')
+		os.utime(self.zip, ns=(1, 1))
+		new = archive.open_archive(self.zip)
+		self.assertIsNot(new, old, "Измененный архив не перечитан")
+		self.assertIsNone(old.handle.fp, "Прежний архив не закрыт")
+		self.assertTrue(archive.isfile(os.path.join(self.zip, 'm030101mh.lbol')), "Новый файл не найден")
+
+
+class ModelGridTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		write_model(self.tmp.name, 'm020209mh', 40)
+		write_model(self.tmp.name, 'm010305mh', 20)
+		self.models = {'m020209mh': 0, 'm010305mh': 1, 'm030101mh': 2}
+		self.out = os.path.join(self.tmp.name, 'grid.npz')
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_grid(self):
+		grid = ModelGrid.load(self.models, cache='off', data_dir=self.tmp.name)
+		self.assertEqual(len(grid), 3, "Неправильное число моделей")
+		self.assertEqual(list(np.diff(grid.mag_offsets)), [40, 20, 0], "Неправильные смещения")
+		self.assertTrue(np.array_equal(grid['m010305mh'].tl, np.arange(20.0)), "Неправильный срез модели")
+		self.assertEqual(grid[0].mni, 0.2, "Неправильная масса никеля")
+		self.assertEqual(list(grid.minB()[:2]), [-19, -19], "Неправильно найден максимум")
+		self.assertTrue(np.isnan(grid.minB()[2]), "Максимум для модели без данных")
+		dm15, minV, short = grid.pf_relation()
+		self.assertEqual(list(short), [False, True, True], "Неправильно найдены короткие кривые")
+		pack_grid(self.tmp.name, self.out, cache='off')
+		packed = ModelGrid.load({'m020209mh': 0}, bundle=GridBundle(self.out))
+		self.assertTrue(np.array_equal(packed[0].lbol, grid[0].lbol), "Неправильно считано из пакета")
+
+
+class EmulatorTest(unittest.TestCase):
+	def setUp(self):
+		tl = np.arange(0.0, 40.0)
+		self.names = ['m010101mh', 'm030101mh', 'm020301mh']
+		curves = [np.c_[tl, 42 - 0.01 * tl + 0.1 * k] for k in range(3)]
+		tt = [np.c_[tl, -19 + 0.01 * (tl - 10) ** 2 + k, -18 + 0.01 * tl] for k in range(3)]
+		self.grid = ModelGrid.from_tables(self.names, tt, curves)
+		self.emulator = Emulator.from_grid(self.grid)
+
+	def test_evaluate(self):
+		t = np.array([5.25, 20.0, 30.5])
+		exact = self.emulator.evaluate([3, 1, 1], 'lbol', t)
+		self.assertTrue(np.allclose(exact, 42 - 0.01 * t + 0.1), "Кривая модели не совпадает")
+		middle = self.emulator.evaluate([[2, 1, 1]], 'lbol', t, k=2)
+		self.assertTrue(np.allclose(middle[0], 42 - 0.01 * t + 0.05), "Неправильная интерполяция")
+		self.assertTrue(np.isnan(self.emulator.evaluate([1, 1, 1], 'MB', [50.0])[0]), "Значение вне кривой")
+		point, rms = self.emulator.fit(t, -19 + 0.01 * (t - 10) ** 2 + 2, points=self.emulator.params)
+		self.assertEqual(list(point), [2, 3, 1], "Неправильно подобрана модель")
+
+	def test_save(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'emulator.npz')
+			self.emulator.save(path)
+			loaded = Emulator.load(path)
+		self.assertEqual(loaded.names, self.names, "Неправильно сохранены модели")
+		points = loaded.lattice(5)
+		self.assertTrue(np.allclose(loaded.evaluate(points, 'MV'), self.emulator.evaluate(points, 'MV'),
+									equal_nan=True), "Неправильно сохранены таблицы")
+
+
+class ServerTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		write_model(self.tmp.name, 'm010305mh', 30)
+		write_model(self.tmp.name, 'm020209mh', 40)
+		self.state = GridState(self.tmp.name, cache='off', interval=0)
+		self.server = make_server(self.state, port=0)
+		threading.Thread(target=self.server.serve_forever, daemon=True).start()
+		self.client = GridClient(f'http://127.0.0.1:{self.server.server_address[1]}')
+
+	def tearDown(self):
+		self.server.shutdown()
+		self.server.server_close()
+		self.tmp.cleanup()
+
+	def test_queries(self):
+		models = self.client.models()
+		self.assertEqual(sorted(models), ['m010305mh', 'm020209mh'], "Неправильный список моделей")
+		expected = model_times(models, cache='off', data_dir=self.tmp.name)
+		for remote, local in zip(self.client.model_times(models), expected):
+			self.assertTrue(np.allclose(remote, local), "Времена отличаются от локального расчета")
+		minB = self.client.model_minB(['m020209mh', 'm030101mh'])
+		self.assertEqual(minB[0], -19, "Неправильный minB")
+		self.assertTrue(np.isnan(minB[1]), "minB для модели, которой нет на сервере")
+
+	def test_reload(self):
+		self.client.model_minB(['m010305mh'])
+		self.assertEqual(self.client.query('/status')['reloads'], 1, "Сетка перечитана без изменений")
+		time.sleep(0.01)
+		write_model(self.tmp.name, 'm030101mh', 20)
+		self.assertEqual(len(self.client.models()), 3, "Новая модель не загружена")
+		self.assertEqual(self.client.query('/status')['reloads'], 2, "Неправильное число перезагрузок")
+
+	def test_parameters(self):
+		snapshot = self.state.refresh()
+		threads = [threading.Thread(target=snapshot.find_times, args=(10 ** -(1 + i % 40),)) for i in range(80)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(len(snapshot.entries), snapshot.maxsize, "Кэш параметров не ограничен")
+
+	def test_error(self):
+		def refresh(force=False):
+			raise OSError('model file removed')
+		self.state.refresh = refresh
+		with self.assertRaises(urllib.error.HTTPError) as error:
+			self.client.query('/minB')
+		self.assertEqual(error.exception.code, 500, "Ошибка сервера без ответа")
+		self.assertIn('model file removed', json.loads(error.exception.read())['error'], "Нет текста ошибки")
+
+
+class RenderTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		write_model(self.tmp.name, 'm020209mh', 40)
+		write_model(self.tmp.name, 'm010305mh', 30)
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_render(self):
+		grid = ModelGrid.load({'m020209mh': 0, 'm010305mh': 1}, cache='off', data_dir=self.tmp.name)
+		out = os.path.join(self.tmp.name, 'graphics')
+		paths = render_all(grid_figures(grid, out, num=2, dpi=50))
+		self.assertEqual(sorted(os.listdir(out)), ['PF.jpeg', 'lbol.eps', 'ta.png', 'tb.eps'], "Не все графики сохранены")
+		self.assertTrue(all(os.path.getsize(path) > 0 for path in paths), "Пустой график")
+
+
+class MemoTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		write_model(self.tmp.name, 'm020209mh', 40)
+		write_model(self.tmp.name, 'm010305mh', 30)
+
+	def tearDown(self):
+		MEMO.disk(None)
+		self.tmp.cleanup()
+
+	def test_tiers(self):
+		memo = Memo(maxsize=2, path=os.path.join(self.tmp.name, 'memo'), max_bytes=400)
+		for key in 'abc':
+			memo.put(key, np.arange(3.0))
+		self.assertEqual(list(memo.entries), ['b', 'c'], "Неправильное вытеснение из памяти")
+		self.assertTrue(np.array_equal(memo.get('a'), np.arange(3.0)), "Не прочитано с диска")
+		memo.evict()
+		self.assertEqual(len(os.listdir(memo.path)), 2, "Не соблюден размер на диске")
+		memo = Memo(max_memory=100)
+		for key in 'abc':
+			memo.put(key, np.arange(5.0))
+		self.assertEqual(list(memo.entries), ['b', 'c'], "Не соблюден размер в памяти")
+		self.assertEqual(memo.nbytes, 80, "Неправильно посчитан размер в памяти")
+
+	def test_times(self):
+		MEMO.disk(os.path.join(self.tmp.name, 'memo'))
+		cache_dir = os.path.join(self.tmp.name, 'cache')
+		models = {'m020209mh': 0, 'm010305mh': 1}
+		ta = model_times(models, data_dir=self.tmp.name, cache_dir=cache_dir)[0]
+		MEMO.clear()
+		hits = MEMO.hits
+		self.assertTrue(np.array_equal(model_times(models, data_dir=self.tmp.name, cache_dir=cache_dir)[0], ta), "Неправильно сохранено")
+		self.assertEqual(MEMO.hits - hits, 2, "Значения не взяты с диска")
+		misses = MEMO.misses
+		write_model(self.tmp.name, 'm010305mh', 35)
+		os.utime(os.path.join(self.tmp.name, 'm010305mh.lbol'), ns=(1, 1))
+		STATS.reset()
+		model_times(models, data_dir=self.tmp.name, cache_dir=cache_dir)
+		self.assertGreater(MEMO.misses, misses, "Измененный файл не пересчитан")
+		self.assertEqual(STATS.summary()['counters']['files_parsed'], 2, "Пересчитаны неизмененные модели")
+
+	def test_cache_off(self):
+		models = {'m020209mh': 0, 'm010305mh': 1}
+		ModelGrid.load(models, 'off', data_dir=self.tmp.name)
+		for cache in ('use', 'off'):
+			STATS.reset()
+			ModelGrid.load(models, cache, data_dir=self.tmp.name)
+			parsed = STATS.summary()['counters'].get('files_parsed', 0)
+			self.assertEqual(parsed, 0 if cache == 'use' else 4, f"Неправильно использована память при cache={cache}")
+		STATS.reset()
+		model_times(models, cache='off', data_dir=self.tmp.name)
+		self.assertEqual(STATS.summary()['counters']['files_parsed'], 4, "cache=off не перечитывает файлы")
+
+
+class SweepTest(unittest.TestCase):
+	def test_times(self):
+		tl = np.arange(0.0, 60.0, 1.0)
+		crossing = deposition_lbol(tl, 0.5) + 0.3 * np.cos(tl / 6)
+		grid = ModelGrid.from_tables(['m050101mh', 'm050103mh'], [np.zeros((0, 3))] * 2,
+									 [np.c_[tl, crossing], np.c_[tl, crossing + 0.1]])
+		eps = parse_values(['0:0.2:3'])
+		self.assertEqual(list(eps), [0, 0.1, 0.2], "Неправильно разобраны значения")
+		table = sweep_times(grid, eps, chunk=2)
+		for e in eps:
+			rows = table[table['eps'] == e]
+			ta, tb, *args = find_ta_tb_batch(grid.lbol_t, grid.lbol, grid.lbol_offsets, grid.mni, e)
+			self.assertTrue(np.array_equal(rows['ta'], ta) and np.array_equal(rows['tb'], tb), "Неправильно посчитаны времена")
+
+	def test_matches(self):
+		rng = np.random.default_rng(2)
+		x1, c, mag = rng.normal(0, 1, 30), rng.normal(0.1, 0.1, 30), rng.normal(-19.3, 0.5, 50)
+		table = sweep_matches(x1, c, mag, [-19.5, -19.4], [0.1, 0.15], [3.0], [0.2, 0.4], chunk=3)
+		self.assertEqual(len(table), 8 * 30, "Не все сочетания посчитаны")
+		for row in table[::7]:
+			z = row['MB'] - row['alpha'] * x1[row['object']] + row['beta'] * c[row['object']]
+			self.assertEqual(row['matched'], np.sum(np.abs(mag - z) <= row['tol']), "Неправильно найдены модели")
+			self.assertEqual(row['nearest'], np.argmin(np.abs(mag - z)), "Неправильно найдена ближайшая модель")
+
+
+class SwdReaderTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		with open(os.path.join(self.tmp.name, 'm010005mh.swd'), 'w') as f:
+			for t in (0.5, 1.0, 2.0):
+				for zone in range(1, 5):
+					time = t if zone in (1, 4) else 0
+					f.write(f'{time:11.6f} {zone:4d} {t * zone:10.4f} {-t:8.3f}\n')
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_epochs(self):
+		swd = SwdReader('m010005mh', data_dir=self.tmp.name, cache='off')
+		epochs = list(swd)
+		self.assertEqual([t for t, _ in epochs], [0.5, 1.0, 2.0], "Неправильно считаны моменты")
+		self.assertEqual(epochs[1][1].shape, (4, 3), "Неправильно считан блок")
+		t, table = SwdReader('m010005mh', data_dir=self.tmp.name, cache='off').at_time(1.9)
+		self.assertEqual(t, 2.0, "Неправильно найден момент")
+		self.assertTrue(np.array_equal(table[:, 1], [2, 4, 6, 8]), "Неправильно считан блок")
+
+
+class TauReaderTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		with open(os.path.join(self.tmp.name, 'm010005mh.tau'), 'w') as f:
+			for t in (1e4, 8.64e4, 1.728e5):
+				f.write(f'PROPER T= {t:.8E}\n')
+				f.write(' NZON      R14.       V 8.        T 5.     13.801   13.848   13.895\n')
+				for zone in range(1, 4):
+					f.write(f'{zone:5d} {t * 1e-5 * zone:11.6f} {zone:13.7f} {15 - zone:10.4f} 1.00E+0{zone} 2.00E+00 3.00E-01\n')
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_blocks(self):
+		tau = TauReader('m010005mh', data_dir=self.tmp.name, cache='off')
+		self.assertEqual(tau.block_time(b'PROPER T= 1.72800000E+05\n'), 2.0, "Время должно быть в днях")
+		self.assertIsNone(tau.block_time(b'    1    0.000014\n'), "Строка зоны не начинает блок")
+		t, table = tau.at_time(0.9)
+		self.assertEqual(t, 1.0, "Неправильно найден момент")
+		self.assertEqual(table.shape, (3, 7), "Неправильно считан блок")
+		self.assertTrue(np.array_equal(table[:, 0], [1, 2, 3]), "Неправильно считаны зоны")
+		self.assertTrue(np.allclose(table[:, 4], [10, 100, 1000]), "Неправильно считаны толщины")
+		self.assertTrue(np.allclose(tau.lgfreq(2), [13.801, 13.848, 13.895]), "Неправильно считаны частоты")
+		self.assertEqual(len(list(TauReader('m010005mh', data_dir=self.tmp.name, cache='off'))), 3, "Неправильно считаны блоки")
+
+	def test_index(self):
+		cache_dir = os.path.join(self.tmp.name, 'cache')
+		index = TauReader('m010005mh', self.tmp.name, 'use', cache_dir).index
+		self.assertEqual(len(os.listdir(cache_dir)), 1, "Индекс не сохранен")
+		STATS.reset()
+		tau = TauReader('m010005mh', self.tmp.name, 'use', cache_dir)
+		self.assertTrue(np.array_equal(tau.index, index), "Неправильно прочитан индекс")
+		self.assertNotIn('bytes_read', STATS.summary()['counters'], "Файл просмотрен повторно")
+		self.assertTrue(np.allclose(tau.epoch(1)[1], list(TauReader('m010005mh', self.tmp.name, 'off'))[1][1]), "Неправильно прочитан блок")
+
+	def test_abstract(self):
+		with self.assertRaises(TypeError):
+			BlockReader('m010005mh')
+
+
+def write_flx(path, mname, nfrus=(4, 4)):
+	dtype = np.dtype([('t', '<f8'), ('nfrus', '<i4'), ('flux', '<f8', (6,))])
+	with open(os.path.join(path, mname + '.flx'), 'wb') as f:
+		for (start, n), nfr in zip(((0, 3), (3, 2)), nfrus):
+			record = np.zeros(n, dtype)
+			record['t'] = np.arange(start, start + n)
+			record['nfrus'] = nfr
+			record['flux'][:, :nfr] = record['t'][:, None] * 10 + np.arange(nfr)
+			record['flux'][:, -1] = 999
+			body = np.int32(n).tobytes() + record.tobytes()
+			marker = np.int32(len(body)).tobytes()
+			f.write(marker + body + marker)
+		f.write(np.array([4, 0, 4], '<i4').tobytes())
+	with open(os.path.join(path, mname + '.res'), 'w') as f:
+		f.write('%RUN:\n WAVES: 4000.0 3000.0\n WAVES: 2000.0 1000.0\n%H:\n WAVES: 1.0\n')
+
+
+def write_res(path, mname, times=(0.5, 1.0, 2.0), zones=3):
+	with open(os.path.join(path, mname + '.res'), 'w') as f:
+		f.write('%RUN:\n  <===== HYDRODYNAMIC RUN OF MODEL\n')
+		for k, t in enumerate(times):
+			f.write(f'%H:\n   NSTEP\n     {k}\n  OBS.TIME=        {t:.5f} D   PROPER T= 1.0E+04 S\n')
+			f.write('  ZON   AM/SOL      R14.\n')
+			if k != 1:
+				for i in range(1, zones + 1):
+					f.write(f'  {i:2d} ' + ' '.join(f'{t * i + j:.4E}' for j in range(19)) + f' {i:2d}\n')
+			f.write('%B:\n            10        20\n')
+
+
+class HydroReaderTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		write_res(self.tmp.name, 'm010305mh')
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_blocks(self):
+		read = HydroReader('m010305mh', self.tmp.name, 'off')
+		self.assertEqual(list(read.times), [0.5, 1.0, 2.0], "Неправильно найдены блоки")
+		self.assertEqual(list(read.index['zones']), [3, 0, 3], "Неправильно посчитаны зоны")
+		epochs = list(HydroReader('m010305mh', self.tmp.name, 'off'))
+		self.assertTrue(np.array_equal(epochs[2][1], read.epoch(2)[1]), "Проход по файлу и чтение по индексу не совпадают")
+		self.assertEqual(len(epochs[1][1]), 0, "В блоке нет таблицы зон")
+		t, zones = read.at_time(1.4)
+		self.assertEqual(t, 2.0, "Выбран блок без таблицы зон")
+		self.assertEqual(list(zones['zone']), [1, 2, 3], "Неправильно прочитаны зоны")
+		self.assertEqual(list(zones['am']), [2.0, 4.0, 6.0], "Неправильно прочитаны столбцы")
+
+	def test_index(self):
+		cache_dir = os.path.join(self.tmp.name, 'cache')
+		index = HydroReader('m010305mh', self.tmp.name, 'use', cache_dir).index
+		self.assertEqual(len(os.listdir(cache_dir)), 1, "Индекс не сохранен")
+		read = HydroReader('m010305mh', self.tmp.name, 'off')
+		self.assertTrue(np.array_equal(BlockReader.scan(read), index), "Индекс mmap не совпадает с построчным")
+		STATS.reset()
+		self.assertTrue(np.array_equal(HydroReader('m010305mh', self.tmp.name, 'use', cache_dir).index, index), "Неправильно прочитан индекс")
+		self.assertNotIn('bytes_read', STATS.summary()['counters'], "Файл просмотрен повторно")
+
+
+class FlxReaderTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		write_flx(self.tmp.name, 'm010005mh', nfrus=(4, 3))
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_flux(self):
+		flx = FlxReader('m010005mh', data_dir=self.tmp.name)
+		self.assertEqual(list(flx.time), [0, 1, 2, 3, 4], "Неправильно считаны моменты")
+		self.assertEqual(list(flx.waves), [4000, 3000, 2000, 1000], "Неправильно считаны длины волн")
+		t, flux = flx.epoch(3)
+		self.assertEqual((t, flux[1]), (3, 31), "Неправильно считан спектр")
+		self.assertEqual(len(flux), 3, "Спектр не ограничен nfrus")
+		self.assertEqual(len(flx.epoch(0)[1]), 4, "Спектр не ограничен длинами волн")
+		self.assertFalse(flux.flags.owndata, "Спектр скопирован")
+		time, waves, flux = flx.select(1, 3, 1500, 3500)
+		self.assertEqual(list(waves), [3000, 2000], "Неправильно выбраны длины волн")
+		self.assertTrue(np.array_equal(flux, [[11, 12], [21, 22], [31, 32]]), "Неправильно выбран поток")
+		time, waves, flux = flx.select(2, 4)
+		self.assertEqual(list(waves), [4000, 3000, 2000, 1000], "Выбраны столбцы без длины волны")
+		self.assertTrue(np.array_equal(flux[:, 3], [23, np.nan, np.nan], equal_nan=True), "Столбец за пределами nfrus не замаскирован")
+		self.assertFalse(np.any(flux == 999), "Последний столбец записи - не поток")
+
+
+class SynPhotTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		write_flx(self.tmp.name, 'm010005mh')
+		self.band = os.path.join(self.tmp.name, 'box.dat')
+		np.savetxt(self.band, [[1500, 1], [3500, 1]])
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_weights(self):
+		waves = np.array([6000.0, 5000.0, 4000.0, 3000.0])
+		weights = filter_weights(waves, [np.array([[3500.0, 1.0], [5500.0, 1.0]])])
+		self.assertAlmostEqual(weights.sum(), 1, msg="Веса не нормированы")
+		lam = np.arange(3500.0, 5501.0)
+		exact = trapz((2 + lam / 1000) / lam, lam) / trapz(1 / lam, lam)
+		self.assertAlmostEqual(((2 + waves / 1000) @ weights)[0], exact, msg="Неправильная свертка")
+
+	def test_magnitudes(self):
+		phot = SyntheticPhotometry([self.band])
+		time, mag = phot.magnitudes('m010005mh', self.tmp.name, cache='off')
+		flux = FlxReader('m010005mh', self.tmp.name).records[0]['flux'][1, :4]
+		expected = -2.5 * np.log10(flux @ filter_weights(np.array([4000.0, 3000.0, 2000.0, 1000.0]), phot.curves))
+		self.assertEqual(list(time), [0, 1, 2, 3, 4], "Неправильно считаны моменты")
+		self.assertAlmostEqual(mag[1, 0], expected[0], msg="Неправильно посчитана величина")
+		self.assertTrue(np.all(np.diff(mag[:, 0]) < 0), "Поток растет, величина должна убывать")
+
+	def test_nfrus(self):
+		write_flx(self.tmp.name, 'm010305mh', nfrus=(4, 3))
+		time, mag = SyntheticPhotometry([self.band]).magnitudes('m010305mh', self.tmp.name, cache='off')
+		self.assertTrue(np.all(np.isfinite(mag[:3, 0])), "Неправильно посчитана величина")
+		self.assertTrue(np.all(np.isnan(mag[3:, 0])), "Фильтру не хватает столбцов nfrus, величина должна быть nan")
+
+
+class PrefetchTest(unittest.TestCase):
+	def test_prefetch(self):
+		lock = threading.Lock()
+		running = [0, 0]
+
+		def work(i):
+			with lock:
+				running[0] += 1
+				running[1] = max(running)
+			time.sleep(0.01 * (i % 3))
+			with lock:
+				running[0] -= 1
+			return i * i
+
+		self.assertEqual(list(prefetch_map(work, range(20), 4)), [i * i for i in range(20)], "Нарушен порядок")
+		self.assertLessEqual(running[1], 4, "Превышено число потоков")
+
+
+class ManifestTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		write_model(self.tmp.name, 'm020209mh', 40)
+		write_model(self.tmp.name, 'm010305mh', 30)
+		self.path = os.path.join(self.tmp.name, 'manifest.json')
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_update(self):
+		changed = GridManifest(self.path, self.tmp.name).update(cache='off')
+		self.assertEqual(sorted(changed), ['m010305mh', 'm020209mh'], "Не все модели посчитаны")
+		manifest = GridManifest(self.path, self.tmp.name)
+		self.assertEqual(manifest.update(cache='off'), [], "Пересчитаны неизмененные модели")
+		write_model(self.tmp.name, 'm010305mh', 35)
+		write_model(self.tmp.name, 'm030101mh', 30)
+		self.assertEqual(sorted(manifest.update(cache='off')), ['m010305mh', 'm030101mh'], "Изменения не найдены")
+		self.assertEqual(manifest.scalars(['m020209mh'], 'minB')[0], -19, "Неправильно сохранены величины")
+
+
+class MatchTest(unittest.TestCase):
+	def test_match(self):
+		rng = np.random.default_rng(1)
+		x1 = rng.normal(0, 1, 200)
+		c = rng.normal(0.1, 0.1, 200)
+		mag = rng.normal(-19.3, 0.5, 300)
+		offsets, models = match_catalogue(x1, c, mag, tol=0.3)
+		z = -19.48 - 0.154 * x1 + 3.02 * c
+		for i in range(len(z)):
+			brute = np.flatnonzero(np.abs(mag - z[i]) <= 0.3)
+			self.assertEqual(sorted(models[offsets[i]:offsets[i + 1]]), list(brute), "Неправильно найдены модели")
+
+
+class MonteCarloTest(unittest.TestCase):
+	def setUp(self):
+		self.read = ResReader(os.path.join('tests', 'salt_test.txt'))
+		self.mag = np.array([-19.6, -19.2, -18.9, -18.3, -17.5])
+
+	def test_errors(self):
+		self.assertAlmostEqual(self.read.err_x1[0], 5.605198574709647e-05, msg="Неправильно считано")
+		self.assertAlmostEqual(self.read.err_c[1], 6.017605802066672e-05, msg="Неправильно считано")
+		self.assertAlmostEqual(self.read.err_t0[0], 2.110812046041133e-06, msg="Неправильно считано")
+
+	def test_no_errors(self):
+		self.read.err_x1 = np.zeros(2)
+		self.read.err_c = np.zeros(2)
+		mag = np.array([-18.28, -19.2])
+		p = stand_probability(self.read, mag, draws=10, block=3)
+		self.assertTrue(np.array_equal(p, self.read.stand_mask(mag)), "Без погрешностей должно совпадать с stand_mask")
+		offsets, models = self.read.match_grid(self.mag, 0.5)
+		p = match_probability(self.read, self.mag, 0.5, draws=10, block=3)
+		for i in range(2):
+			self.assertEqual(list(np.flatnonzero(p[i])), sorted(models[offsets[i]:offsets[i + 1]]), "Неправильно найдены модели")
+			self.assertTrue(np.all(p[i][p[i] > 0] == 1), "Неправильные вероятности")
+
+	def test_probability(self):
+		self.read.err_x1 = np.array([2., 2.])
+		self.read.err_beta = 0.05
+		draws = 40000
+		p = match_probability(self.read, self.mag, 0.5, draws, seed=1, block=1000)
+		z = self.read.correlation_fun(self.read.x1, self.read.color)
+		sigma = np.sqrt((self.read.alpha * 2.) ** 2 + (self.read.color * 0.05) ** 2)
+		phi = np.vectorize(lambda x: 0.5 * (1 + math.erf(x / math.sqrt(2))))
+		expected = phi((self.mag - z[:, None] + 0.5) / sigma[:, None]) - phi((self.mag - z[:, None] - 0.5) / sigma[:, None])
+		self.assertTrue(np.all(np.abs(p - expected) < 4 * np.sqrt(0.25 / draws)), "Вероятности не сходятся")
+		p1 = self.read.stand_probability(np.array([-18.28, -19.2]), draws, seed=1)
+		p2 = stand_probability(self.read, np.array([-18.28, -19.2]), draws, seed=2, block=7)
+		self.assertEqual(list(p1.keys()), list(self.read.names), "Неправильные объекты")
+		self.assertTrue(np.allclose(list(p1.values()), p2, atol=4 * np.sqrt(0.25 / draws)), "Результат зависит от блоков")
+
+
+class PhotometryTest(unittest.TestCase):
+	def test_metrics(self):
+		tl = np.arange(0.0, 40.0, 2.0)
+		full = -19 + 0.01 * (tl - 10) ** 2
+		short = -18 + 0.01 * (tl[:10] - 12) ** 2
+		t, mag, offsets = concat_curves([(tl, full), (tl[:10], short)])
+		t_peak, m_peak, dm15, is_short = peak_metrics(t, mag, offsets)
+		self.assertEqual(list(t_peak), [10, 12], "Неправильно найден максимум")
+		self.assertEqual(list(m_peak), [-19, -18], "Неправильно найден максимум")
+		self.assertAlmostEqual(dm15[0], 0.01 * 15 ** 2 + 0.01, msg="Неправильно посчитан dm15")
+		self.assertEqual(list(is_short), [False, True], "Короткая кривая не найдена")
+		self.assertTrue(np.isnan(dm15[1]), "dm15 для короткой кривой")
+
+	def test_exact_end(self):
+		tl = np.arange(0.0, 26.0)
+		t, mag, offsets = concat_curves([(tl, -19 + 0.01 * (tl - 10) ** 2)])
+		t_peak, m_peak, dm15, is_short = peak_metrics(t, mag, offsets)
+		self.assertFalse(is_short[0], "Кривая, заканчивающаяся в t_peak + 15, считается короткой")
+		self.assertAlmostEqual(dm15[0], 0.01 * 15 ** 2, msg="Неправильно посчитан dm15")
+
+	def test_rates(self):
+		tl = np.arange(0.0, 60.0, 0.5)
+		linear = np.where(tl < 5, -19 + 0.2 * (5 - tl), -19 + 0.05 * (tl - 5))
+		t, mag, offsets = concat_curves([(tl, linear), (tl, linear + 1), (tl[:30], linear[:30])])
+		t_peak, m_peak, rate, short = decline_rates(t, mag, offsets, days=(15, 40))
+		self.assertEqual(rate.shape, (3, 2), "Неправильная форма таблицы скоростей")
+		self.assertTrue(np.allclose(rate[:2], 0.05), "Неправильно посчитана скорость спада")
+		self.assertEqual(short.tolist(), [[False, False], [False, False], [True, True]], "Короткая кривая не найдена")
+		self.assertTrue(np.all(np.isnan(rate[2])), "Скорость для короткой кривой")
+		self.assertTrue(np.allclose(rate[:2, 0] * 15, peak_metrics(t, mag, offsets)[2][:2]), "Не совпадает с dm15")
+
+
+class InstrumentTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		write_model(self.tmp.name, 'm010305mh', 30)
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_stats(self):
+		@timed('reduce')
+		def nested(n):
+			return nested(n - 1) if n else 0
+
+		STATS.reset()
+		nested(3)
+		fname = os.path.join(self.tmp.name, 'm010305mh.tt')
+		cached_loadtxt(fname, 'rebuild', self.tmp.name, skiprows=1)
+		cached_loadtxt(fname, 'use', self.tmp.name, skiprows=1)
+		summary = STATS.summary()
+		self.assertEqual(summary['timers']['reduce']['calls'], 1, "Вложенные вызовы учтены дважды")
+		self.assertEqual(summary['counters']['bytes_read'], os.path.getsize(fname), "Неправильно посчитаны байты")
+		self.assertEqual(summary['counters']['cache_hits'], 1, "Неправильно посчитаны попадания в кэш")
+
+	def test_profile(self):
+		prefix = os.path.join(self.tmp.name, 'run')
+		with profile(prefix):
+			find_ta_tb_batch(np.arange(10.), np.full(10, 42.), [0, 10], [0.6])
+		self.assertTrue(os.path.isfile(prefix + '.prof'), "Нет файла cProfile")
+		with open(prefix + '.json') as f:
+			summary = json.load(f)
+		self.assertEqual(summary['timers']['reduce']['calls'], 1, "Этап не учтен")
+		self.assertTrue(summary['functions'], "Нет списка функций")
+
+
+	def test_setup_log(self):
+		root = logging.getLogger().level
+		handlers, level, propagate = list(log.handlers), log.level, log.propagate
+		try:
+			setup_log('DEBUG')
+			setup_log('DEBUG')
+			self.assertEqual(log.level, logging.DEBUG, "Не задан уровень логгера пакета")
+			self.assertEqual(len(log.handlers), len(handlers) or 1, "Обработчик добавлен дважды")
+			self.assertEqual(logging.getLogger().level, root, "Изменен уровень корневого логгера")
+		finally:
+			log.handlers[:] = handlers
+			log.setLevel(level)
+			log.propagate = propagate
+
+class StartupTest(unittest.TestCase):
+	def test_lazy_matplotlib(self):
+		code = 'import sys, calculate.res, calculate.grid; print("matplotlib" in sys.modules)'
+		proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+							  cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+		self.assertEqual(proc.stdout.strip(), 'False', "matplotlib импортируется при загрузке")
+
+	def test_lazy_package(self):
+		code = 'import sys, light_curve; print(sorted(m for m in sys.modules if m.startswith(("light_curve.", "numpy"))))'
+		proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+							  cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True)
+		self.assertEqual(proc.stdout.strip(), '[]', "Модули пакета импортируются при загрузке")
+
+	def test_importtime(self):
+		text = 'import time: self [us] | cumulative | imported package\n' \
+			   'import time:       120 |        120 |   numpy\n' \
+			   'import time:        30 |        150 | light_curve\n'
+		result = parse_importtime(text)
+		self.assertEqual(list(result), ['numpy', 'light_curve'], "Неправильно разобран вывод importtime")
+		self.assertTrue(np.allclose(result['light_curve'], (30e-6, 150e-6)), "Неправильно разобрано время")
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file